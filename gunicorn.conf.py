@@ -0,0 +1,13 @@
+"""
+Gunicorn settings loaded from the working directory, e.g.
+gunicorn social_media_api.wsgi
+"""
+import os
+
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    """Stop counting live metric gauges of exited workers"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,232 @@
+"""
+Async versions of the feed, post detail and like/unlike endpoints for
+ASGI servers. They share querysets, serializers and response cache
+with PostViewSet.
+
+Django 4.2 runs async ORM and cache calls in sync_to_async with
+thread_sensitive=True, so database work of a process still goes through
+one thread. These views free the event loop while waiting, but they do
+not parallelize queries (see the benchmark_async command).
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.http import Http404, HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    MethodNotAllowed,
+    NotAuthenticated,
+    NotFound,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from post.like_buffer import get_like_buffer, record_like
+from post.models import Comment, Like, Post, TimelineEntry, normalize_hashtag
+from post.serializers import (
+    PostDetailSerializer,
+    PostLikeStateSerializer,
+    PostListSerializer,
+)
+from post.views import PostCursorPagination, annotate_viewer_state, filter_visible
+from social_media_api.cache import (
+    abump_versions,
+    aget_cached_response,
+    aget_versions,
+    aset_cached_response,
+    response_cache_key,
+    version_key,
+)
+from user.authentication import CachedJWTAuthentication
+
+
+def render(data, status_code: int = status.HTTP_200_OK) -> HttpResponse:
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status_code,
+        content_type="application/json",
+    )
+
+
+def render_exception(request, exception: APIException) -> HttpResponse:
+    """Error response in the format of DRF's exception handler"""
+    data = exception.detail
+
+    if not isinstance(data, (list, dict)):
+        data = {"detail": data}
+
+    response = render(data, exception.status_code)
+
+    if exception.status_code == status.HTTP_401_UNAUTHORIZED:
+        response.headers[
+            "WWW-Authenticate"
+        ] = CachedJWTAuthentication().authenticate_header(request)
+
+    return response
+
+
+def async_api_view(methods: tuple[str, ...], use_replica: bool = False):
+    """
+    Authenticate the request with JWT, wrap it into a DRF Request
+    and render the returned data or API errors as JSON
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise MethodNotAllowed(request.method)
+
+                result = await CachedJWTAuthentication().aauthenticate(request)
+
+                if result is None:
+                    raise NotAuthenticated()
+
+                request = Request(request)
+                request.user, request.auth = result
+                return render(await view(request, *args, **kwargs))
+            except Http404:
+                return render({"detail": NotFound.default_detail}, NotFound.status_code)
+            except APIException as exception:
+                return render_exception(request, exception)
+
+        # django.views.decorators.csrf.csrf_exempt supports async views in Django 5
+        wrapper.csrf_exempt = True
+        wrapper.use_replica = use_replica
+        return wrapper
+
+    return decorator
+
+
+async def get_pending_likes(post_ids: list[int], user_id: int) -> dict:
+    if settings.LIKES_WRITE_BEHIND and post_ids:
+        return await sync_to_async(get_like_buffer().get_pending)(post_ids, user_id)
+    return {}
+
+
+@async_api_view(methods=("GET",), use_replica=True)
+async def post_list(request: Request) -> dict:
+    """Async PostViewSet.list"""
+    user = request.user
+    cache_key = response_cache_key("post-list", request, user.id)
+    data = await aget_cached_response("post-list", cache_key)
+
+    if data is not None:
+        return data
+
+    versions = await aget_versions([version_key("feed", user.id)])
+    entries = TimelineEntry.objects.filter(user=user).order_by(
+        "-created_at", "-post_id"
+    )
+    hashtag = request.query_params.get("hashtag")
+    hashtag_prefix = request.query_params.get("hashtag_prefix")
+
+    if hashtag:
+        entries = entries.filter(post__hashtags__name=normalize_hashtag(hashtag))
+
+    if hashtag_prefix:
+        entries = entries.filter(
+            Exists(
+                Post.hashtags.through.objects.filter(
+                    post_id=OuterRef("post_id"),
+                    hashtag__name__startswith=normalize_hashtag(hashtag_prefix),
+                )
+            )
+        )
+
+    paginator = PostCursorPagination()
+    page = await paginator.apaginate_queryset(
+        entries.only("post_id", "created_at"), request
+    )
+    post_ids = [entry.post_id for entry in page]
+    versions.update(
+        await aget_versions([version_key("post", post_id) for post_id in post_ids])
+    )
+    posts = await filter_visible(
+        annotate_viewer_state(Post.objects.filter(is_displayed=True), user), user
+    ).ain_bulk(post_ids)
+    serializer = PostListSerializer(
+        [posts[post_id] for post_id in post_ids if post_id in posts],
+        many=True,
+        context={
+            "request": request,
+            "pending_likes": await get_pending_likes(post_ids, user.id),
+        },
+    )
+    data = paginator.get_paginated_response(serializer.data).data
+    await aset_cached_response(cache_key, data, versions)
+    return data
+
+
+@async_api_view(methods=("GET",), use_replica=True)
+async def post_detail(request: Request, pk: int) -> dict:
+    """Async PostViewSet.retrieve"""
+    user = request.user
+    cache_key = response_cache_key("post-detail", request, user.id)
+    data = await aget_cached_response("post-detail", cache_key)
+
+    if data is not None:
+        return data
+
+    versions = await aget_versions(
+        [version_key("post", pk), version_key("feed", user.id)]
+    )
+    queryset = filter_visible(
+        annotate_viewer_state(Post.objects.filter(is_displayed=True), user), user
+    )
+    post = await queryset.filter(pk=pk).afirst()
+
+    if post is None:
+        raise Http404
+
+    latest_comments = [
+        comment
+        async for comment in Comment.objects.filter(post_id=pk)[
+            : settings.POST_DETAIL_COMMENTS_PREVIEW
+        ]
+    ]
+    serializer = PostDetailSerializer(
+        post,
+        context={
+            "request": request,
+            "pending_likes": await get_pending_likes([pk], user.id),
+            "latest_comments": latest_comments,
+        },
+    )
+    data = serializer.data
+    await aset_cached_response(cache_key, data, versions)
+    return data
+
+
+async def set_like(request: Request, pk: int, liked: bool) -> dict:
+    if settings.LIKES_WRITE_BEHIND:
+        result = await sync_to_async(record_like)(pk, request.user.id, liked)
+    else:
+        like = Like.objects.like if liked else Like.objects.unlike
+        result = await sync_to_async(like)(post_id=pk, user_id=request.user.id)
+
+    if result is None:
+        raise Http404
+
+    likes_count, changed = result
+
+    if changed:
+        await abump_versions("post", [pk])
+
+    return PostLikeStateSerializer({"liked": liked, "likes_count": likes_count}).data
+
+
+@async_api_view(methods=("POST",))
+async def post_like(request: Request, pk: int) -> dict:
+    """Async PostViewSet.like"""
+    return await set_like(request, pk, liked=True)
+
+
+@async_api_view(methods=("POST",))
+async def post_unlike(request: Request, pk: int) -> dict:
+    """Async PostViewSet.unlike"""
+    return await set_like(request, pk, liked=False)
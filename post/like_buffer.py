@@ -0,0 +1,413 @@
+import functools
+import threading
+from collections import defaultdict
+from typing import NamedTuple
+
+import redis
+from django.conf import settings
+
+from post.models import Like
+
+# Falls back to the database state ARGV[4] only if no flush completed since
+# it was read (flush generation ARGV[5]), returns -1 otherwise
+RECORD_SCRIPT = """
+local current
+if redis.call("SISMEMBER", KEYS[1], ARGV[1]) == 1 then
+    current = 1
+elseif redis.call("SISMEMBER", KEYS[2], ARGV[1]) == 1 then
+    current = 0
+elseif redis.call("SISMEMBER", KEYS[5], ARGV[1]) == 1 then
+    current = 1
+elseif redis.call("SISMEMBER", KEYS[6], ARGV[1]) == 1 then
+    current = 0
+elseif tonumber(redis.call("GET", KEYS[7]) or 0) ~= tonumber(ARGV[5]) then
+    return -1
+else
+    current = tonumber(ARGV[4])
+end
+local desired = tonumber(ARGV[3])
+if current == desired then
+    return 0
+end
+if desired == 1 then
+    redis.call("SREM", KEYS[2], ARGV[1])
+    redis.call("SADD", KEYS[1], ARGV[1])
+    redis.call("HINCRBY", KEYS[3], ARGV[2], 1)
+else
+    redis.call("SREM", KEYS[1], ARGV[1])
+    redis.call("SADD", KEYS[2], ARGV[1])
+    redis.call("HINCRBY", KEYS[3], ARGV[2], -1)
+end
+redis.call("SADD", KEYS[4], ARGV[2])
+return 1
+"""
+
+# Moves pending changes of up to ARGV[1] posts to the in-flight keys, unless
+# a previous flush left some there, and returns the in-flight changes
+DRAIN_SCRIPT = """
+local prefix = ARGV[2]
+if redis.call("SCARD", KEYS[3]) == 0 then
+    for _, post in ipairs(redis.call("SPOP", KEYS[1], ARGV[1])) do
+        for _, kind in ipairs({"add:", "remove:"}) do
+            if redis.call("EXISTS", prefix .. kind .. post) == 1 then
+                redis.call(
+                    "RENAME", prefix .. kind .. post, prefix .. "flushing:" .. kind .. post
+                )
+            end
+        end
+        local delta = redis.call("HGET", KEYS[2], post)
+        if delta then
+            redis.call("HSET", KEYS[4], post, delta)
+            redis.call("HDEL", KEYS[2], post)
+        end
+        redis.call("SADD", KEYS[3], post)
+    end
+end
+local result = {}
+for _, post in ipairs(redis.call("SMEMBERS", KEYS[3])) do
+    table.insert(result, {
+        post,
+        redis.call("SMEMBERS", prefix .. "flushing:add:" .. post),
+        redis.call("SMEMBERS", prefix .. "flushing:remove:" .. post),
+    })
+end
+return result
+"""
+
+COMPLETE_SCRIPT = """
+for _, post in ipairs(redis.call("SMEMBERS", KEYS[1])) do
+    redis.call(
+        "DEL", ARGV[1] .. "flushing:add:" .. post, ARGV[1] .. "flushing:remove:" .. post
+    )
+end
+redis.call("DEL", KEYS[1], KEYS[2])
+redis.call("INCR", KEYS[3])
+return 1
+"""
+
+# Moves in-flight changes back to the pending ones, newer pending changes of
+# a user win, the deltas add up as both are relative to the database
+REQUEUE_SCRIPT = """
+local prefix = ARGV[1]
+for _, post in ipairs(redis.call("SMEMBERS", KEYS[1])) do
+    local add_key = prefix .. "add:" .. post
+    local remove_key = prefix .. "remove:" .. post
+    for _, kind in ipairs({{"add:", add_key}, {"remove:", remove_key}}) do
+        local flushing_key = prefix .. "flushing:" .. kind[1] .. post
+        for _, user in ipairs(redis.call("SMEMBERS", flushing_key)) do
+            if redis.call("SISMEMBER", add_key, user) == 0
+                and redis.call("SISMEMBER", remove_key, user) == 0 then
+                redis.call("SADD", kind[2], user)
+            end
+        end
+        redis.call("DEL", flushing_key)
+    end
+    local delta = redis.call("HGET", KEYS[2], post)
+    if delta then
+        redis.call("HINCRBY", KEYS[3], post, delta)
+    end
+    redis.call("SADD", KEYS[4], post)
+end
+redis.call("DEL", KEYS[1], KEYS[2])
+return 1
+"""
+
+
+class PendingLikes(NamedTuple):
+    delta: int
+    # Pending like state of the user or None if there is no pending change
+    liked: bool | None
+
+
+class LocalLikeBuffer:
+    """
+    Process-local like buffer for tests. Drained changes stay in flight
+    until the flush commits so they are still seen by record and get_pending
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.added = defaultdict(set)
+        self.removed = defaultdict(set)
+        self.deltas = defaultdict(int)
+        self.flushing = {}
+        self.flushing_deltas = {}
+        self.generation = 0
+
+    def get_state(self, post_id: int, user_id: int) -> bool | None:
+        state = get_pending_state(
+            user_id in self.added.get(post_id, ()),
+            user_id in self.removed.get(post_id, ()),
+        )
+
+        if state is None and post_id in self.flushing:
+            added, removed = self.flushing[post_id]
+            state = get_pending_state(user_id in added, user_id in removed)
+
+        return state
+
+    def get_generation(self) -> int:
+        return self.generation
+
+    def record(
+        self, post_id: int, user_id: int, liked: bool, db_liked: bool, generation: int
+    ) -> bool | None:
+        with self.lock:
+            current = self.get_state(post_id, user_id)
+
+            if current is None:
+                if generation != self.generation:
+                    return None
+                current = db_liked
+
+            if current == liked:
+                return False
+
+            if liked:
+                self.removed[post_id].discard(user_id)
+                self.added[post_id].add(user_id)
+                self.deltas[post_id] += 1
+            else:
+                self.added[post_id].discard(user_id)
+                self.removed[post_id].add(user_id)
+                self.deltas[post_id] -= 1
+
+            return True
+
+    def get_pending(self, post_ids: list[int], user_id: int) -> dict[int, PendingLikes]:
+        with self.lock:
+            return {
+                post_id: PendingLikes(
+                    delta=self.deltas.get(post_id, 0)
+                    + self.flushing_deltas.get(post_id, 0),
+                    liked=self.get_state(post_id, user_id),
+                )
+                for post_id in post_ids
+            }
+
+    def flush_lock(self):
+        return self.lock
+
+    def drain(self, limit: int) -> dict[int, tuple[set[int], set[int]]]:
+        with self.lock:
+            if not self.flushing:
+                post_ids = list(set(self.added) | set(self.removed))[:limit]
+
+                for post_id in post_ids:
+                    self.flushing[post_id] = (
+                        self.added.pop(post_id, set()),
+                        self.removed.pop(post_id, set()),
+                    )
+                    self.flushing_deltas[post_id] = self.deltas.pop(post_id, 0)
+
+            return dict(self.flushing)
+
+    def complete(self) -> None:
+        with self.lock:
+            self.flushing.clear()
+            self.flushing_deltas.clear()
+            self.generation += 1
+
+    def requeue(self) -> None:
+        with self.lock:
+            for post_id, (added, removed) in self.flushing.items():
+                pending = self.added[post_id] | self.removed[post_id]
+                self.added[post_id] |= added - pending
+                self.removed[post_id] |= removed - pending
+                self.deltas[post_id] += self.flushing_deltas.get(post_id, 0)
+
+            self.flushing.clear()
+            self.flushing_deltas.clear()
+
+
+class RedisLikeBuffer:
+    """
+    Like buffer keeping pending likes in Redis sets and a delta hash per post.
+    Drained changes are moved to "flushing" keys deleted after the flush
+    commits, a failed or interrupted flush is retried from them.
+    """
+
+    prefix = "likes:"
+
+    def __init__(self, url: str):
+        self.client = redis.Redis.from_url(url)
+        self.record_script = self.client.register_script(RECORD_SCRIPT)
+        self.drain_script = self.client.register_script(DRAIN_SCRIPT)
+        self.complete_script = self.client.register_script(COMPLETE_SCRIPT)
+        self.requeue_script = self.client.register_script(REQUEUE_SCRIPT)
+        self.deltas_key = f"{self.prefix}deltas"
+        self.dirty_key = f"{self.prefix}dirty"
+        self.flushing_key = f"{self.prefix}flushing"
+        self.flushing_deltas_key = f"{self.prefix}flushing:deltas"
+        self.generation_key = f"{self.prefix}generation"
+
+    def added_key(self, post_id: int, flushing: bool = False) -> str:
+        return f"{self.prefix}{'flushing:' if flushing else ''}add:{post_id}"
+
+    def removed_key(self, post_id: int, flushing: bool = False) -> str:
+        return f"{self.prefix}{'flushing:' if flushing else ''}remove:{post_id}"
+
+    def get_generation(self) -> int:
+        return int(self.client.get(self.generation_key) or 0)
+
+    def record(
+        self, post_id: int, user_id: int, liked: bool, db_liked: bool, generation: int
+    ) -> bool | None:
+        keys = [
+            self.added_key(post_id),
+            self.removed_key(post_id),
+            self.deltas_key,
+            self.dirty_key,
+            self.added_key(post_id, flushing=True),
+            self.removed_key(post_id, flushing=True),
+            self.generation_key,
+        ]
+        args = [user_id, post_id, int(liked), int(db_liked), generation]
+        result = self.record_script(keys=keys, args=args)
+        return None if result == -1 else bool(result)
+
+    def get_pending(self, post_ids: list[int], user_id: int) -> dict[int, PendingLikes]:
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.hmget(self.deltas_key, post_ids)
+        pipeline.hmget(self.flushing_deltas_key, post_ids)
+
+        for post_id in post_ids:
+            for flushing in (False, True):
+                pipeline.sismember(self.added_key(post_id, flushing), user_id)
+                pipeline.sismember(self.removed_key(post_id, flushing), user_id)
+
+        deltas, flushing_deltas, *members = pipeline.execute()
+        pending = {}
+
+        for i, post_id in enumerate(post_ids):
+            added, removed, flushing_added, flushing_removed = members[
+                4 * i : 4 * i + 4
+            ]
+            liked = get_pending_state(added, removed)
+            pending[post_id] = PendingLikes(
+                delta=int(deltas[i] or 0) + int(flushing_deltas[i] or 0),
+                liked=(
+                    get_pending_state(flushing_added, flushing_removed)
+                    if liked is None
+                    else liked
+                ),
+            )
+
+        return pending
+
+    def flush_lock(self):
+        return self.client.lock(
+            f"{self.prefix}flush-lock",
+            timeout=settings.LIKE_BUFFER_FLUSH_LOCK_TIMEOUT,
+            blocking_timeout=0,
+        )
+
+    def drain(self, limit: int) -> dict[int, tuple[set[int], set[int]]]:
+        drained = self.drain_script(
+            keys=[
+                self.dirty_key,
+                self.deltas_key,
+                self.flushing_key,
+                self.flushing_deltas_key,
+            ],
+            args=[limit, self.prefix],
+        )
+        return {
+            int(post_id): (
+                {int(user) for user in added},
+                {int(user) for user in removed},
+            )
+            for post_id, added, removed in drained
+        }
+
+    def complete(self) -> None:
+        self.complete_script(
+            keys=[self.flushing_key, self.flushing_deltas_key, self.generation_key],
+            args=[self.prefix],
+        )
+
+    def requeue(self) -> None:
+        self.requeue_script(
+            keys=[
+                self.flushing_key,
+                self.flushing_deltas_key,
+                self.deltas_key,
+                self.dirty_key,
+            ],
+            args=[self.prefix],
+        )
+
+
+def get_pending_state(added: bool, removed: bool) -> bool | None:
+    if added:
+        return True
+    if removed:
+        return False
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_like_buffer() -> LocalLikeBuffer | RedisLikeBuffer:
+    if settings.LIKE_BUFFER_URL:
+        return RedisLikeBuffer(settings.LIKE_BUFFER_URL)
+
+    return LocalLikeBuffer()
+
+
+def record_like(post_id: int, user_id: int, liked: bool) -> tuple[int, bool] | None:
+    """
+    Record a like or unlike in the buffer. Return the likes count merged
+    with pending changes and whether the state changed, or None if the post
+    is not visible to the user.
+    """
+    post_id = int(post_id)
+    buffer = get_like_buffer()
+    changed = None
+
+    # A flush completing between reading the database and recording the
+    # change makes the database state stale, record() then returns None
+    while changed is None:
+        generation = buffer.get_generation()
+        state = Like.objects.get_state(post_id, user_id)
+
+        if state is None:
+            return None
+
+        likes_count, db_liked = state
+        changed = buffer.record(post_id, user_id, liked, db_liked, generation)
+
+    pending = buffer.get_pending([post_id], user_id)[post_id]
+    return likes_count + pending.delta, changed
+
+
+def flush_likes() -> int:
+    """
+    Write buffered likes to the database. Returns the number of flushed
+    posts, 0 if another flush is running
+    """
+    buffer = get_like_buffer()
+
+    try:
+        with buffer.flush_lock():
+            drained = buffer.drain(settings.LIKE_BUFFER_FLUSH_BATCH)
+            added = [
+                (post_id, user_id)
+                for post_id, (users, _) in drained.items()
+                for user_id in users
+            ]
+            removed = [
+                (post_id, user_id)
+                for post_id, (_, users) in drained.items()
+                for user_id in users
+            ]
+
+            try:
+                Like.objects.apply_buffered(added, removed)
+            except Exception:
+                buffer.requeue()
+                raise
+
+            buffer.complete()
+            return len(drained)
+    except redis.exceptions.LockError:
+        return 0
@@ -0,0 +1,225 @@
+import contextlib
+import json
+import math
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Exists, OuterRef
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from post.models import TimelineEntry
+from user.models import UserFollower
+
+ENDPOINTS = (
+    "feed",
+    "post-detail",
+    "like",
+    "unlike",
+    "comment-list",
+    "user-search",
+    "profile",
+    "follow",
+    "unfollow",
+)
+SEARCH_TERMS = ("ol", "andr", "smith", "kova", "emma", "tanaka", "silva", "noah")
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class Command(BaseCommand):
+    """
+    Command to benchmark the main API endpoints against the current database
+    (see generate_dataset). Reports latency percentiles, throughput and SQL
+    query counts of all databases and fails if an endpoint exceeds its stored budgets.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument(
+            "--users", type=int, default=20, help="Number of users sending requests"
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Clear the cache before every request",
+        )
+        parser.add_argument("--budgets-file", default=settings.BENCHMARK_BUDGETS_FILE)
+        parser.add_argument(
+            "--update-budgets",
+            action="store_true",
+            help="Store the measured query counts as the new budgets",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options["seed"])
+        clients = self.get_clients()
+        results = {name: {"latencies": [], "queries": []} for name in ENDPOINTS}
+        started_at = time.perf_counter()
+
+        for _ in range(options["iterations"]):
+            user, client = self.rng.choice(clients)
+
+            for name, method, path in self.get_requests(user):
+                self.measure(results[name], client, method, path)
+
+        elapsed = time.perf_counter() - started_at
+        self.report(results, elapsed)
+
+    def get_clients(self) -> list[tuple]:
+        users = list(
+            get_user_model()
+            .objects.filter(
+                Exists(TimelineEntry.objects.filter(user=OuterRef("pk"))),
+                is_active=True,
+            )
+            .order_by("?")[: self.options["users"]]
+        )
+
+        if not users:
+            raise CommandError(
+                "No users with posts in their timelines, "
+                "generate data with generate_dataset"
+            )
+
+        self.author_ids = list(
+            get_user_model()
+            .objects.filter(is_active=True)
+            .order_by("?")
+            .values_list("id", flat=True)[:1000]
+        )
+        clients = []
+
+        for user in users:
+            client = APIClient(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+            client.credentials(
+                HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+            )
+            clients.append((user, client))
+
+        return clients
+
+    def get_requests(self, user) -> list[tuple[str, str, str]]:
+        post_id = (
+            TimelineEntry.objects.filter(user=user)
+            .order_by("-created_at")
+            .values_list("post_id", flat=True)[: self.rng.randint(1, 20)]
+        )
+        post_id = list(post_id)[-1]
+        followed = set(
+            UserFollower.objects.filter(follower=user).values_list("user_id", flat=True)
+        )
+        candidates = [
+            author_id
+            for author_id in self.author_ids
+            if author_id not in followed and author_id != user.id
+        ]
+        author_id = self.rng.choice(candidates) if candidates else None
+        term = self.rng.choice(SEARCH_TERMS)
+        requests = [
+            ("feed", "get", "/api/posts/"),
+            ("post-detail", "get", f"/api/posts/{post_id}/"),
+            ("like", "post", f"/api/posts/{post_id}/like/"),
+            ("unlike", "post", f"/api/posts/{post_id}/unlike/"),
+            ("comment-list", "get", f"/api/posts/{post_id}/comments/"),
+            ("user-search", "get", f"/api/users/?q={term}"),
+            ("profile", "get", "/api/users/profile/"),
+        ]
+
+        if author_id is not None:
+            requests += [
+                ("follow", "post", f"/api/users/{author_id}/follow/"),
+                ("unfollow", "post", f"/api/users/{author_id}/unfollow/"),
+            ]
+
+        return requests
+
+    def measure(self, result: dict, client: APIClient, method: str, path: str):
+        if self.options["cold"]:
+            cache.clear()
+
+        with contextlib.ExitStack() as stack:
+            queries = [
+                stack.enter_context(CaptureQueriesContext(connection))
+                for connection in connections.all()
+            ]
+            started_at = time.perf_counter()
+            response = getattr(client, method)(path)
+            latency = time.perf_counter() - started_at
+
+        if response.status_code >= 400:
+            raise CommandError(
+                f"{method.upper()} {path} returned {response.status_code}"
+            )
+
+        result["latencies"].append(latency * 1000)
+        result["queries"].append(sum(len(captured) for captured in queries))
+
+    def load_budgets(self) -> dict:
+        try:
+            with open(self.options["budgets_file"]) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def report(self, results: dict, elapsed: float) -> None:
+        budgets = self.load_budgets()
+        failures = []
+        self.stdout.write(
+            f"{'endpoint':<14}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'mean ms':>9}{'queries':>9}{'budget':>8}"
+        )
+
+        for name, result in results.items():
+            if not result["latencies"]:
+                continue
+
+            latencies = sorted(result["latencies"])
+            queries = max(result["queries"])
+            budget = budgets.get(name, {})
+            p95 = percentile(latencies, 95)
+            self.stdout.write(
+                f"{name:<14}{len(latencies):>9}{percentile(latencies, 50):>9.1f}"
+                f"{p95:>9.1f}{percentile(latencies, 99):>9.1f}"
+                f"{sum(latencies) / len(latencies):>9.1f}"
+                f"{queries:>9}{budget.get('queries', '-'):>8}"
+            )
+
+            if "queries" in budget and queries > budget["queries"]:
+                failures.append(
+                    f"{name}: {queries} queries, budget {budget['queries']}"
+                )
+            if "p95_ms" in budget and p95 > budget["p95_ms"]:
+                failures.append(f"{name}: p95 {p95:.1f} ms, budget {budget['p95_ms']}")
+
+            if self.options["update_budgets"]:
+                budgets[name] = {**budget, "queries": queries}
+
+        total = sum(len(result["latencies"]) for result in results.values())
+        self.stdout.write(
+            f"{total} requests in {elapsed:.1f} s ({total / elapsed:.1f} req/s)"
+        )
+
+        if self.options["update_budgets"]:
+            with open(self.options["budgets_file"], "w") as file:
+                json.dump(budgets, file, indent=4)
+                file.write("\n")
+            self.stdout.write(self.style.SUCCESS("Budgets updated"))
+            return
+
+        if failures:
+            raise CommandError("Budgets exceeded:\n" + "\n".join(failures))
+
+        self.stdout.write(self.style.SUCCESS("All endpoints within budgets"))
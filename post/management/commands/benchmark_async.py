@@ -0,0 +1,175 @@
+import asyncio
+import queue
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Exists, OuterRef
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from post.management.commands.benchmark import percentile
+from post.models import TimelineEntry
+
+MODES = ("wsgi", "asgi")
+
+
+class Command(BaseCommand):
+    """
+    Command to compare the sync (WSGI) feed and post detail endpoints served
+    by threads with the async (ASGI) ones served by one event loop, at the
+    same concurrency. A fixed delay is added to every SQL query to simulate
+    a slow database.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=20,
+            help="Number of WSGI threads and concurrent ASGI requests",
+        )
+        parser.add_argument(
+            "--query-delay",
+            type=float,
+            default=20,
+            help="Milliseconds added to every SQL query",
+        )
+        parser.add_argument("--mode", choices=MODES, action="append")
+
+    def handle(self, *args, **options):
+        self.options = options
+        user = (
+            get_user_model()
+            .objects.filter(Exists(TimelineEntry.objects.filter(user=OuterRef("pk"))))
+            .first()
+        )
+
+        if user is None:
+            raise CommandError(
+                "No users with posts in their timelines, "
+                "generate data with generate_dataset"
+            )
+
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        self.post_ids = list(
+            TimelineEntry.objects.filter(user=user)
+            .order_by("-created_at")
+            .values_list("post_id", flat=True)[:20]
+        )
+        self.slow_down_queries()
+        self.stdout.write(
+            f"{'mode':<6}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'req/s':>9}"
+        )
+
+        # AsyncClient always sends the "testserver" host
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for mode in options["mode"] or MODES:
+                started_at = time.perf_counter()
+                latencies = getattr(self, f"run_{mode}")()
+                self.report(mode, latencies, time.perf_counter() - started_at)
+
+        connection_created.disconnect(self.add_query_delay)
+
+    def slow_down_queries(self) -> None:
+        connection_created.connect(self.add_query_delay)
+
+        for connection in connections.all():
+            self.add_query_delay(connection=connection)
+
+    def add_query_delay(self, sender=None, connection=None, **kwargs):
+        delay = self.options["query_delay"] / 1000
+
+        def execute(execute, sql, params, many, context):
+            time.sleep(delay)
+            return execute(sql, params, many, context)
+
+        connection.execute_wrappers.append(execute)
+
+    def get_paths(self, prefix: str) -> list[str]:
+        """Feed and detail paths, unique query strings bypass the response cache"""
+        return [
+            f"{prefix}?benchmark={index}"
+            if index % 2
+            else f"{prefix}{self.post_ids[index % len(self.post_ids)]}/"
+            f"?benchmark={index}"
+            for index in range(self.options["requests"])
+        ]
+
+    def run_wsgi(self) -> list[float]:
+        paths = queue.SimpleQueue()
+        latencies = []
+        errors = []
+
+        for path in self.get_paths("/api/posts/"):
+            paths.put(path)
+
+        def worker():
+            client = Client()
+
+            try:
+                while True:
+                    try:
+                        path = paths.get_nowait()
+                    except queue.Empty:
+                        return
+                    latencies.append(self.measure(client.get, path))
+            except CommandError as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker) for _ in range(self.options["concurrency"])
+        ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+        return latencies
+
+    def run_asgi(self) -> list[float]:
+        async def run():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(self.options["concurrency"])
+
+            async def measure(path):
+                async with semaphore:
+                    started_at = time.perf_counter()
+                    response = await client.get(path, headers=self.headers)
+                    self.check_response(response, path)
+                    return (time.perf_counter() - started_at) * 1000
+
+            return await asyncio.gather(
+                *(measure(path) for path in self.get_paths("/api/posts/async/"))
+            )
+
+        return asyncio.run(run())
+
+    def measure(self, get, path: str) -> float:
+        started_at = time.perf_counter()
+        response = get(path, headers=self.headers)
+        self.check_response(response, path)
+        return (time.perf_counter() - started_at) * 1000
+
+    def check_response(self, response, path: str) -> None:
+        if response.status_code >= 400:
+            raise CommandError(f"GET {path} returned {response.status_code}")
+
+    def report(self, mode: str, latencies: list[float], elapsed: float) -> None:
+        latencies = sorted(latencies)
+        self.stdout.write(
+            f"{mode:<6}{len(latencies):>9}{percentile(latencies, 50):>9.1f}"
+            f"{percentile(latencies, 95):>9.1f}{percentile(latencies, 99):>9.1f}"
+            f"{len(latencies) / elapsed:>9.1f}"
+        )
@@ -0,0 +1,454 @@
+import datetime
+import io
+import itertools
+import json
+import os
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Max, Min, QuerySet
+from django.utils import timezone
+
+from post.models import Comment, Like, Post
+from user.models import UserFollower
+
+EMAIL_DOMAIN = "synthetic.example"
+# Pareto shape of all generated distributions: heavy tail with a finite mean
+POWER_LAW_ALPHA = 1.5
+PHASES = ("users", "followers", "posts", "likes", "comments")
+OPTIONS = (
+    "seed",
+    "users",
+    "avg_followings",
+    "avg_posts",
+    "avg_likes",
+    "avg_comments",
+    "days",
+    "chunk_size",
+)
+
+FIRST_NAMES = (
+    "Olena",
+    "Andrii",
+    "Maria",
+    "John",
+    "Emma",
+    "Liam",
+    "Sofia",
+    "Noah",
+    "Yuki",
+    "Omar",
+    "Chen",
+    "Ava",
+)
+LAST_NAMES = (
+    "Shevchenko",
+    "Smith",
+    "Kovalenko",
+    "Garcia",
+    "Muller",
+    "Tanaka",
+    "Rossi",
+    "Nowak",
+    "Silva",
+    "Brown",
+)
+COUNTRIES = ("Ukraine", "Poland", "Germany", "USA", "Japan", "Brazil", "Italy")
+WORDS = (
+    "coffee morning city travel music friends weekend sunset book code "
+    "mountains sea football photo dinner project idea today great new "
+    "love work happy rain summer winter family dog cat movie"
+).split()
+
+
+def power_law(rng: random.Random, mean: float, maximum: int) -> int:
+    """Pareto distributed integer with roughly the given mean"""
+    scale = mean * (POWER_LAW_ALPHA - 1) / POWER_LAW_ALPHA
+    return min(int(scale * rng.paretovariate(POWER_LAW_ALPHA)), maximum)
+
+
+def cumulative_weights(seed: str, size: int) -> list[float]:
+    rng = random.Random(seed)
+    return list(
+        itertools.accumulate(rng.paretovariate(POWER_LAW_ALPHA) for _ in range(size))
+    )
+
+
+def sample_distinct(
+    rng: random.Random, cum_weights: list[float], k: int, exclude: int = -1
+) -> set[int]:
+    """Up to k distinct weighted indexes, popular ones may make it fewer"""
+    population = range(len(cum_weights))
+    chosen = set()
+
+    for _ in range(3):
+        missing = k - len(chosen)
+        if missing <= 0:
+            break
+        chosen.update(rng.choices(population, cum_weights=cum_weights, k=missing))
+        chosen.discard(exclude)
+
+    return chosen
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def copy_rows(table: str, columns: tuple[str, ...], rows) -> int:
+    """Insert rows with COPY FROM STDIN. Returns the number of rows"""
+    buffer = io.StringIO()
+    count = 0
+
+    for row in rows:
+        buffer.write("\t".join(copy_value(value) for value in row) + "\n")
+        count += 1
+
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+    return count
+
+
+class Command(BaseCommand):
+    """
+    Command to generate a seeded synthetic dataset of users, followers, posts,
+    likes and comments with power-law distributions. Rows are inserted with
+    COPY in chunks; progress is kept in a state file to resume interrupted runs.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--users", type=int, default=100_000)
+        parser.add_argument("--avg-followings", type=float, default=30)
+        parser.add_argument("--avg-posts", type=float, default=20)
+        parser.add_argument("--avg-likes", type=float, default=10)
+        parser.add_argument("--avg-comments", type=float, default=2)
+        parser.add_argument(
+            "--days", type=int, default=365, help="Period of posts creation"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Number of users or posts generated per transaction",
+        )
+        parser.add_argument("--password", default="password12345")
+        parser.add_argument("--state-file", default="generate_dataset_state.json")
+        parser.add_argument(
+            "--skip-timelines",
+            action="store_true",
+            help="Do not fill home timelines of generated users",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.state = self.load_state()
+        self.started_at = datetime.datetime.fromisoformat(self.state["started_at"])
+        seed = options["seed"]
+        size = options["users"]
+        self.popularity = cumulative_weights(f"{seed}:popularity", size)
+        self.activity = cumulative_weights(f"{seed}:activity", size)
+        self.password = make_password(options["password"])
+
+        self.run_phase("users", size, self.generate_users)
+        self.user_ids = list(
+            get_user_model()
+            .objects.filter(email__endswith=f"@{EMAIL_DOMAIN}")
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        if len(self.user_ids) != size:
+            raise CommandError(
+                f"Found {len(self.user_ids)} synthetic users instead of {size}, "
+                f"remove them with the state file to generate a new dataset"
+            )
+
+        self.run_phase("followers", size, self.generate_followers)
+        self.run_phase("posts", size, self.generate_posts)
+        # Likes and comments are generated for chunks of post ids
+        bounds = self.synthetic_posts().aggregate(first=Min("id"), last=Max("id"))
+        self.first_post_id = bounds["first"] or 0
+        post_ids = bounds["last"] - self.first_post_id + 1 if bounds["last"] else 0
+        self.run_phase("likes", post_ids, self.generate_likes)
+        self.run_phase("comments", post_ids, self.generate_comments)
+
+        if not self.state.get("counters"):
+            call_command("reconcile_user_counters", stdout=self.stdout)
+            call_command("reconcile_post_counters", stdout=self.stdout)
+            self.state["counters"] = True
+            self.save_state()
+
+        if not options["skip_timelines"] and not self.state.get("timelines"):
+            self.fill_timelines()
+            self.state["timelines"] = True
+            self.save_state()
+
+        self.stdout.write(self.style.SUCCESS("Dataset generated"))
+
+    def load_state(self) -> dict:
+        options = {name: self.options[name] for name in OPTIONS}
+
+        if os.path.exists(self.options["state_file"]):
+            with open(self.options["state_file"]) as file:
+                state = json.load(file)
+
+            if state["options"] != options:
+                raise CommandError(
+                    f"{self.options['state_file']} belongs to a run with other "
+                    f"options: {state['options']}"
+                )
+
+            self.stdout.write(f"Resuming from {self.options['state_file']}")
+            return state
+
+        return {
+            "options": options,
+            "started_at": timezone.now().isoformat(),
+            "chunks": {phase: 0 for phase in PHASES},
+        }
+
+    def save_state(self) -> None:
+        with open(self.options["state_file"], "w") as file:
+            json.dump(self.state, file)
+
+    def run_phase(self, phase: str, total: int, generate) -> None:
+        """
+        Generate rows in chunks of one transaction each. Generators return
+        None for chunks committed before an interruption, so a chunk whose
+        state was not saved is not inserted twice.
+        """
+        chunk_size = self.options["chunk_size"]
+        chunks = (total + chunk_size - 1) // chunk_size
+
+        for chunk in range(self.state["chunks"][phase], chunks):
+            start = chunk * chunk_size
+            stop = min(start + chunk_size, total)
+            rng = random.Random(f"{self.options['seed']}:{phase}:{chunk}")
+
+            with transaction.atomic():
+                rows = generate(rng, start, stop)
+
+            self.state["chunks"][phase] = chunk + 1
+            self.save_state()
+            self.stdout.write(
+                f"{phase}: {stop}/{total} "
+                f"({'already generated' if rows is None else f'{rows} rows'})"
+            )
+
+    def synthetic_posts(self) -> QuerySet:
+        return Post.objects.filter(author__email__endswith=f"@{EMAIL_DOMAIN}")
+
+    def get_posts(self, start: int, stop: int) -> list[tuple[int, datetime.datetime]]:
+        """Synthetic posts with ids in the chunk range"""
+        return list(
+            self.synthetic_posts()
+            .filter(
+                id__gte=self.first_post_id + start, id__lt=self.first_post_id + stop
+            )
+            .order_by("id")
+            .values_list("id", "created_at")
+        )
+
+    def generate_users(self, rng: random.Random, start: int, stop: int) -> int | None:
+        if (
+            get_user_model()
+            .objects.filter(email=f"user{start}@{EMAIL_DOMAIN}")
+            .exists()
+        ):
+            return None
+
+        return copy_rows(
+            "user_user",
+            (
+                "password",
+                "is_superuser",
+                "is_staff",
+                "is_active",
+                "date_joined",
+                "email",
+                "first_name",
+                "last_name",
+                "bio",
+                "country",
+                "followers_count",
+                "followings_count",
+                "picture_variants",
+            ),
+            (
+                (
+                    self.password,
+                    False,
+                    False,
+                    True,
+                    self.started_at
+                    - datetime.timedelta(days=rng.uniform(0, self.options["days"])),
+                    f"user{index}@{EMAIL_DOMAIN}",
+                    rng.choice(FIRST_NAMES),
+                    rng.choice(LAST_NAMES),
+                    text(rng, rng.randint(3, 12)),
+                    rng.choice(COUNTRIES),
+                    0,
+                    0,
+                    "{}",
+                )
+                for index in range(start, stop)
+            ),
+        )
+
+    def generate_followers(
+        self, rng: random.Random, start: int, stop: int
+    ) -> int | None:
+        if UserFollower.objects.filter(
+            follower_id__in=self.user_ids[start:stop]
+        ).exists():
+            return None
+
+        size = len(self.user_ids)
+        return copy_rows(
+            "user_userfollower",
+            ("user_id", "follower_id"),
+            (
+                (self.user_ids[followed], self.user_ids[follower])
+                for follower in range(start, stop)
+                for followed in sample_distinct(
+                    rng,
+                    self.popularity,
+                    power_law(rng, self.options["avg_followings"], size - 1),
+                    exclude=follower,
+                )
+            ),
+        )
+
+    def generate_posts(self, rng: random.Random, start: int, stop: int) -> int | None:
+        if Post.objects.filter(author_id__in=self.user_ids[start:stop]).exists():
+            return None
+
+        days = self.options["days"]
+        return copy_rows(
+            "post_post",
+            (
+                "author_id",
+                "content",
+                "created_at",
+                "is_displayed",
+                "likes_count",
+                "comments_count",
+                "image_variants",
+            ),
+            (
+                (
+                    self.user_ids[author],
+                    text(rng, rng.randint(5, 40)),
+                    self.started_at
+                    - datetime.timedelta(seconds=rng.uniform(0, days * 86400)),
+                    True,
+                    0,
+                    0,
+                    "{}",
+                )
+                for author in range(start, stop)
+                for _ in range(power_law(rng, self.options["avg_posts"], days * 50))
+            ),
+        )
+
+    def generate_likes(self, rng: random.Random, start: int, stop: int) -> int | None:
+        posts = self.get_posts(start, stop)
+
+        if Like.objects.filter(post_id__in=[post_id for post_id, _ in posts]).exists():
+            return None
+
+        size = len(self.user_ids)
+        return copy_rows(
+            "post_like",
+            ("post_id", "user_id"),
+            (
+                (post_id, self.user_ids[user])
+                for post_id, _ in posts
+                for user in sample_distinct(
+                    rng,
+                    self.activity,
+                    power_law(rng, self.options["avg_likes"], size),
+                )
+            ),
+        )
+
+    def generate_comments(
+        self, rng: random.Random, start: int, stop: int
+    ) -> int | None:
+        posts = self.get_posts(start, stop)
+
+        if Comment.objects.filter(
+            post_id__in=[post_id for post_id, _ in posts]
+        ).exists():
+            return None
+
+        size = len(self.user_ids)
+        return copy_rows(
+            "post_comment",
+            ("post_id", "author_id", "text", "created_at"),
+            (
+                (
+                    post_id,
+                    self.user_ids[author],
+                    text(rng, rng.randint(2, 20)),
+                    min(
+                        created_at
+                        + datetime.timedelta(seconds=rng.expovariate(1 / 3600)),
+                        self.started_at,
+                    ),
+                )
+                for post_id, created_at in posts
+                for author in rng.choices(
+                    range(size),
+                    cum_weights=self.activity,
+                    k=power_law(rng, self.options["avg_comments"], size),
+                )
+            ),
+        )
+
+    def fill_timelines(self) -> None:
+        chunk_size = self.options["chunk_size"]
+
+        for start in range(0, len(self.user_ids), chunk_size):
+            user_ids = self.user_ids[start : start + chunk_size]
+
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO post_timelineentry (user_id, post_id, created_at)
+                    SELECT p.author_id, p.id, p.created_at
+                    FROM post_post p
+                    WHERE p.is_displayed AND p.author_id BETWEEN %(first)s AND %(last)s
+                    UNION ALL
+                    SELECT f.follower_id, p.id, p.created_at
+                    FROM user_userfollower f
+                    JOIN post_post p ON p.author_id = f.user_id
+                    WHERE p.is_displayed
+                    AND f.follower_id BETWEEN %(first)s AND %(last)s
+                    ON CONFLICT DO NOTHING
+                    """,
+                    {"first": user_ids[0], "last": user_ids[-1]},
+                )
+                rows = cursor.rowcount
+
+            self.stdout.write(
+                f"timelines: {start + len(user_ids)}/{len(self.user_ids)} "
+                f"({rows} rows)"
+            )
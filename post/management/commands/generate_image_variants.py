@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+
+from post.models import Post
+from post.tasks import generate_post_image_variants
+from user.tasks import generate_user_picture_variants
+
+
+class Command(BaseCommand):
+    """Command to queue variant generation of images uploaded without variants"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true", help="Regenerate existing variants too"
+        )
+
+    def handle(self, *args, **options):
+        for queryset, field, variants_field, task in (
+            (Post.objects, "image", "image_variants", generate_post_image_variants),
+            (
+                get_user_model().objects,
+                "picture",
+                "picture_variants",
+                generate_user_picture_variants,
+            ),
+        ):
+            queryset = queryset.exclude(**{f"{field}__isnull": True}).exclude(
+                **{field: ""}
+            )
+
+            if not options["all"]:
+                queryset = queryset.filter(**{variants_field: {}})
+
+            queued = 0
+
+            for object_id in queryset.values_list("id", flat=True).iterator():
+                task.delay(object_id)
+                queued += 1
+
+            self.stdout.write(
+                f"Queued {queued} {queryset.model._meta.verbose_name_plural}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Queued image variant generation"))
@@ -0,0 +1,39 @@
+from django.core.management import BaseCommand
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from post.models import Post, Like, Comment
+
+
+def count_subquery(model) -> Coalesce:
+    counts = (
+        model.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class Command(BaseCommand):
+    """Command to recompute stored likes and comments counters of posts"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        max_id = Post.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+        updated = 0
+
+        for start in range(0, max_id + 1, batch_size):
+            updated += Post.objects.filter(
+                id__gte=start, id__lt=start + batch_size
+            ).update(
+                likes_count=count_subquery(Like),
+                comments_count=count_subquery(Comment),
+            )
+            self.stdout.write(f"Reconciled posts up to id {start + batch_size - 1}")
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {updated} posts"))
@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+
+from social_media_api.cache import get_stats
+
+
+class Command(BaseCommand):
+    """Command to show response cache hit and miss counters"""
+
+    def handle(self, *args, **options):
+        for name, counters in get_stats().items():
+            total = counters["hit"] + counters["miss"]
+            ratio = counters["hit"] / total if total else 0
+            self.stdout.write(
+                f"{name}: {counters['hit']} hits, {counters['miss']} misses "
+                f"({ratio:.1%} hit ratio)"
+            )
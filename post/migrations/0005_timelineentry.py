@@ -0,0 +1,73 @@
+# Generated by Django 4.2 on 2026-10-18 05:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("post", "0004_post_is_displayed"),
+        ("user", "0004_rename_follower_id_userfollower_follower_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to="post.post",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["user", "-created_at", "-post"],
+                name="post_timeline_user_feed_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="timelineentry",
+            unique_together={("user", "post")},
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO post_timelineentry (user_id, post_id, created_at)
+                SELECT p.author_id, p.id, p.created_at
+                FROM post_post p
+                WHERE p.is_displayed
+                UNION ALL
+                SELECT f.follower_id, p.id, p.created_at
+                FROM post_post p
+                JOIN user_userfollower f ON f.user_id = p.author_id
+                WHERE p.is_displayed
+                ON CONFLICT DO NOTHING
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
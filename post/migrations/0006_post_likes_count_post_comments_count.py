@@ -0,0 +1,51 @@
+# Generated by Django 4.2 on 2026-10-18 05:46
+
+from django.db import migrations, models
+from django.db.models import Max
+
+BATCH_SIZE = 1000
+
+
+def backfill_post_counters(apps, schema_editor):
+    # Batches commit separately (the migration is not atomic), so rows are
+    # locked for one batch at a time
+    Post = apps.get_model("post", "Post")
+    last_id = Post.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(0, last_id, BATCH_SIZE):
+            cursor.execute(
+                """
+                UPDATE post_post p
+                SET likes_count = (
+                    SELECT COUNT(*) FROM post_like l WHERE l.post_id = p.id
+                ),
+                comments_count = (
+                    SELECT COUNT(*) FROM post_comment c WHERE c.post_id = p.id
+                )
+                WHERE p.id > %s AND p.id <= %s
+                """,
+                [start, start + BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("post", "0005_timelineentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="comments_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_post_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-18 05:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0006_post_likes_count_post_comments_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Hashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="hashtags",
+            field=models.ManyToManyField(
+                blank=True, related_name="posts", to="post.hashtag"
+            ),
+        ),
+    ]
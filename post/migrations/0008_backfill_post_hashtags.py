@@ -0,0 +1,60 @@
+# Generated by Django 4.2 on 2026-10-18 05:48
+
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+HASHTAG_PATTERN = re.compile(r"#(\w+)")
+HASHTAG_WORD_PATTERN = re.compile(r"\w+")
+
+
+def backfill_post_hashtags(apps, schema_editor):
+    Post = apps.get_model("post", "Post")
+    Hashtag = apps.get_model("post", "Hashtag")
+    PostHashtag = Post.hashtags.through
+    last_id = 0
+
+    while True:
+        posts = list(
+            Post.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "content", "hashtag")[:BATCH_SIZE]
+        )
+
+        if not posts:
+            break
+
+        post_names = {}
+
+        for post_id, content, hashtag in posts:
+            names = HASHTAG_PATTERN.findall(content or "")
+            names += HASHTAG_WORD_PATTERN.findall(hashtag or "")
+            post_names[post_id] = {name.casefold()[:100] for name in names}
+
+        all_names = set().union(*post_names.values())
+        Hashtag.objects.bulk_create(
+            [Hashtag(name=name) for name in all_names], ignore_conflicts=True
+        )
+        hashtag_ids = dict(
+            Hashtag.objects.filter(name__in=all_names).values_list("name", "id")
+        )
+        PostHashtag.objects.bulk_create(
+            [
+                PostHashtag(post_id=post_id, hashtag_id=hashtag_ids[name])
+                for post_id, names in post_names.items()
+                for name in names
+            ],
+            ignore_conflicts=True,
+        )
+        last_id = posts[-1][0]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0007_hashtag"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_post_hashtags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-18 05:48
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('pg_catalog.english', coalesce({row}hashtag, '')), 'A')
+    || setweight(to_tsvector('pg_catalog.english', coalesce({row}content, '')), 'B')
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0008_backfill_post_hashtags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunSQL(
+            sql=f"""
+                CREATE FUNCTION post_search_vector_update() RETURNS trigger AS $$
+                BEGIN
+                    NEW.search_vector := {SEARCH_VECTOR_SQL.format(row="NEW.")};
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER post_search_vector_trigger
+                BEFORE INSERT OR UPDATE OF content, hashtag ON post_post
+                FOR EACH ROW EXECUTE FUNCTION post_search_vector_update();
+
+                UPDATE post_post SET search_vector = {SEARCH_VECTOR_SQL.format(row="")};
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS post_search_vector_trigger ON post_post;
+                DROP FUNCTION IF EXISTS post_search_vector_update();
+            """,
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="post_search_vector_idx"
+            ),
+        ),
+    ]
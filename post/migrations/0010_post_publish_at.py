@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0009_post_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="publish_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("is_displayed", False)),
+                fields=["publish_at"],
+                name="post_publish_at_pending_idx",
+            ),
+        ),
+    ]
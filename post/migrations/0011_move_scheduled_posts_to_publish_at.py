@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-18 05:58
+
+import datetime
+import json
+
+from django.db import migrations
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+def move_scheduled_posts(apps, schema_editor):
+    """
+    Copy the schedule time of pending one-off create_post beat tasks
+    to Post.publish_at and delete the tasks with their clocked schedules.
+    """
+    Post = apps.get_model("post", "Post")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    ClockedSchedule = apps.get_model("django_celery_beat", "ClockedSchedule")
+    tasks = PeriodicTask.objects.filter(task="post.tasks.create_post")
+
+    for task in tasks.iterator():
+        post_id, schedule_time = json.loads(task.args)
+        publish_at = parse_datetime(schedule_time)
+
+        if publish_at is None:
+            continue
+
+        if timezone.is_naive(publish_at):
+            publish_at = timezone.make_aware(publish_at, datetime.timezone.utc)
+
+        Post.objects.filter(pk=post_id, is_displayed=False).update(
+            publish_at=publish_at
+        )
+
+    tasks.delete()
+    ClockedSchedule.objects.filter(periodictask__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0010_post_publish_at"),
+        ("django_celery_beat", "0018_improve_crontab_helptext"),
+    ]
+
+    operations = [
+        migrations.RunPython(move_scheduled_posts, migrations.RunPython.noop),
+    ]
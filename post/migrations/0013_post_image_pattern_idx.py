@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0012_post_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["image"],
+                name="post_image_pattern_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+    ]
@@ -1,8 +1,16 @@
 import os
+import re
 import uuid
+from collections import Counter
 
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connections, models, router, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from social_media_api.images import delete_variants_on_commit
 
 
 def post_image_file_path(instance, filename):
@@ -12,29 +20,259 @@ def post_image_file_path(instance, filename):
     return os.path.join("uploads/post_images/", filename)
 
 
+HASHTAG_PATTERN = re.compile(r"#(\w+)")
+HASHTAG_WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize_hashtag(name: str) -> str:
+    return name.lstrip("#").casefold()[:100]
+
+
+def extract_hashtags(content: str | None, hashtag: str | None) -> set[str]:
+    """Collect #tags from the post content and words of the hashtag field"""
+    names = HASHTAG_PATTERN.findall(content or "")
+    names += HASHTAG_WORD_PATTERN.findall(hashtag or "")
+
+    return {normalize_hashtag(name) for name in names}
+
+
+class Hashtag(models.Model):
+    # Unique CharField also gets a varchar_pattern_ops index for prefix lookups
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self) -> str:
+        return f"#{self.name}"
+
+
+PUBLISH_DUE_SQL = """
+    WITH due AS (
+        SELECT id FROM post_post
+        WHERE NOT is_displayed AND publish_at <= now()
+        ORDER BY publish_at
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE post_post p
+    SET is_displayed = TRUE, created_at = p.publish_at
+    FROM due
+    WHERE p.id = due.id
+    RETURNING p.id
+"""
+
+
+class PostManager(models.Manager):
+    def publish_due(self, batch_size: int) -> list[int]:
+        """Display up to batch_size scheduled posts that are due. Returns their ids"""
+        using = router.db_for_write(self.model)
+
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            cursor.execute(PUBLISH_DUE_SQL, {"batch_size": batch_size})
+            return [post_id for post_id, in cursor.fetchall()]
+
+
 class Post(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="posts"
     )
     content = models.TextField()
     image = models.ImageField(null=True, blank=True, upload_to=post_image_file_path)
+    # Filled by the generate_post_image_variants task
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     hashtag = models.CharField(max_length=100, null=True, blank=True)
     is_displayed = models.BooleanField(default=True)
+    publish_at = models.DateTimeField(null=True, blank=True)
+    hashtags = models.ManyToManyField(Hashtag, related_name="posts", blank=True)
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    # Kept up to date by the post_search_vector_trigger database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PostManager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="post_search_vector_idx"),
+            models.Index(
+                fields=["publish_at"],
+                condition=models.Q(is_displayed=False),
+                name="post_publish_at_pending_idx",
+            ),
+            # Prefix lookups of the post owning a media file (see media.can_view)
+            models.Index(
+                fields=["image"],
+                name="post_image_pattern_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Post {self.id} by {self.author}"
 
-    @property
-    def likes_number(self) -> int:
-        return self.likes.count()
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+
+        if update_fields is None or {"content", "hashtag"} & set(update_fields):
+            self.update_hashtags()
+
+    def update_hashtags(self) -> None:
+        """Link the post to Hashtag rows parsed from content and hashtag"""
+        names = extract_hashtags(self.content, self.hashtag)
+        Hashtag.objects.bulk_create(
+            [Hashtag(name=name) for name in names], ignore_conflicts=True
+        )
+        self.hashtags.set(Hashtag.objects.filter(name__in=names))
+
+
+@receiver(post_delete, sender=Post)
+def delete_post_image_variants(sender, instance: Post, **kwargs) -> None:
+    delete_variants_on_commit(instance.image_variants)
+
+
+VISIBLE_POST_SQL = """
+    SELECT p.id, p.likes_count
+    FROM post_post p
+    WHERE p.id = %(post_id)s
+    AND p.is_displayed
+    AND (
+        p.author_id = %(user_id)s
+        OR EXISTS (
+            SELECT 1 FROM user_userfollower f
+            WHERE f.user_id = p.author_id AND f.follower_id = %(user_id)s
+        )
+    )
+"""
+
+LIKE_SQL = f"""
+    WITH visible AS ({VISIBLE_POST_SQL}),
+    changed AS (
+        INSERT INTO post_like (post_id, user_id)
+        SELECT id, %(user_id)s FROM visible
+        ON CONFLICT (post_id, user_id) DO NOTHING
+        RETURNING post_id
+    ),
+    counter AS (
+        UPDATE post_post SET likes_count = likes_count + 1
+        WHERE id IN (SELECT post_id FROM changed)
+        RETURNING likes_count
+    )
+    SELECT
+        COALESCE((SELECT likes_count FROM counter), visible.likes_count),
+        EXISTS (SELECT 1 FROM changed)
+    FROM visible
+"""
+
+UNLIKE_SQL = f"""
+    WITH visible AS ({VISIBLE_POST_SQL}),
+    changed AS (
+        DELETE FROM post_like l
+        USING visible
+        WHERE l.post_id = visible.id AND l.user_id = %(user_id)s
+        RETURNING l.post_id
+    ),
+    counter AS (
+        UPDATE post_post SET likes_count = likes_count - 1
+        WHERE id IN (SELECT post_id FROM changed)
+        RETURNING likes_count
+    )
+    SELECT
+        COALESCE((SELECT likes_count FROM counter), visible.likes_count),
+        EXISTS (SELECT 1 FROM changed)
+    FROM visible
+"""
+
+
+LIKE_STATE_SQL = f"""
+    SELECT
+        visible.likes_count,
+        EXISTS (
+            SELECT 1 FROM post_like l
+            WHERE l.post_id = visible.id AND l.user_id = %(user_id)s
+        )
+    FROM ({VISIBLE_POST_SQL}) visible
+"""
+
+BULK_LIKE_SQL = """
+    INSERT INTO post_like (post_id, user_id)
+    SELECT d.post_id, d.user_id
+    FROM unnest(%s::bigint[], %s::bigint[]) AS d(post_id, user_id)
+    JOIN post_post p ON p.id = d.post_id
+    JOIN user_user u ON u.id = d.user_id
+    ON CONFLICT (post_id, user_id) DO NOTHING
+    RETURNING post_id
+"""
+
+BULK_UNLIKE_SQL = """
+    DELETE FROM post_like l
+    USING unnest(%s::bigint[], %s::bigint[]) AS d(post_id, user_id)
+    WHERE l.post_id = d.post_id AND l.user_id = d.user_id
+    RETURNING l.post_id
+"""
+
+BULK_LIKES_COUNT_SQL = """
+    UPDATE post_post p
+    SET likes_count = p.likes_count + d.delta
+    FROM unnest(%s::bigint[], %s::integer[]) AS d(id, delta)
+    WHERE p.id = d.id
+"""
+
+
+class LikeManager(models.Manager):
+    """Like and unlike posts visible to the user in a single statement"""
+
+    def _execute(self, sql: str, post_id: int, user_id: int) -> tuple | None:
+        # self.db is a replica for reads of replica-routed requests, these
+        # statements write or read the state they are about to change
+        with connections[router.db_for_write(self.model)].cursor() as cursor:
+            cursor.execute(sql, {"post_id": post_id, "user_id": user_id})
+            return cursor.fetchone()
+
+    def like(self, post_id: int, user_id: int) -> tuple[int, bool] | None:
+        """
+        Return the likes count and whether a like was added,
+        or None if the post is not visible to the user.
+        """
+        return self._execute(LIKE_SQL, post_id, user_id)
+
+    def unlike(self, post_id: int, user_id: int) -> tuple[int, bool] | None:
+        """
+        Return the likes count and whether a like was removed,
+        or None if the post is not visible to the user.
+        """
+        return self._execute(UNLIKE_SQL, post_id, user_id)
+
+    def get_state(self, post_id: int, user_id: int) -> tuple[int, bool] | None:
+        """
+        Return the likes count and whether the user liked the post,
+        or None if the post is not visible to the user.
+        """
+        return self._execute(LIKE_STATE_SQL, post_id, user_id)
 
-    @property
-    def comments_number(self) -> int:
-        return self.comments.count()
+    def apply_buffered(
+        self, added: list[tuple[int, int]], removed: list[tuple[int, int]]
+    ) -> None:
+        """Write (post_id, user_id) likes and unlikes with likes counters in bulk"""
+        deltas = Counter()
+        using = router.db_for_write(self.model)
+
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            for sql, pairs, delta in (
+                (BULK_LIKE_SQL, added, 1),
+                (BULK_UNLIKE_SQL, removed, -1),
+            ):
+                if pairs:
+                    cursor.execute(sql, [list(column) for column in zip(*pairs)])
+                    for (post_id,) in cursor.fetchall():
+                        deltas[post_id] += delta
+
+            changed = {post_id: delta for post_id, delta in deltas.items() if delta}
+
+            if changed:
+                cursor.execute(
+                    BULK_LIKES_COUNT_SQL, [list(changed), list(changed.values())]
+                )
 
 
 class Like(models.Model):
@@ -43,6 +281,8 @@ class Like(models.Model):
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="likes"
     )
 
+    objects = LikeManager()
+
     class Meta:
         unique_together = ("post", "user")
 
@@ -63,3 +303,27 @@ class Comment(models.Model):
 
     def __str__(self) -> str:
         return f"Comment to post {self.post.id} by {self.author}"
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-post"],
+                name="post_timeline_user_feed_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Post {self.post_id} in timeline of user {self.user_id}"
@@ -1,22 +1,32 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from post.models import Post, Like, Comment
+from social_media_api.images import ImageVariantsField, StrippedImageField
+from social_media_api.instrumentation import InstrumentedSerializerMixin
 
 
-class LikeSerializer(serializers.ModelSerializer):
+class LikeSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Like
         fields = ("id", "post", "user")
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class PostLikeStateSerializer(serializers.Serializer):
+    liked = serializers.BooleanField()
+    likes_count = serializers.IntegerField()
+
+
+class CommentSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ("id", "post", "author", "text", "created_at")
         read_only_fields = ("id", "author", "post", "created_at")
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
+    image = StrippedImageField(required=False, allow_null=True)
+
     class Meta:
         model = Post
         fields = ("id", "created_at", "author", "content", "image", "hashtag")
@@ -24,7 +34,8 @@ class PostSerializer(serializers.ModelSerializer):
 
 
 class PostScheduleSerializer(serializers.ModelSerializer):
-    schedule_time = serializers.DateTimeField(required=True, source="created_at")
+    schedule_time = serializers.DateTimeField(required=True, source="publish_at")
+    image = StrippedImageField(required=False, allow_null=True)
 
     class Meta:
         model = Post
@@ -43,13 +54,14 @@ class PostScheduleSerializer(serializers.ModelSerializer):
         validated_data["is_displayed"] = False
         return Post.objects.create(**validated_data)
 
-    def to_representation(self, instance) -> dict:
-        data = super().to_representation(instance)
-        data["schedule_time"] = self.initial_data["schedule_time"]
-        return data
-
 
 class PostListSerializer(PostSerializer):
+    image_variants = ImageVariantsField()
+    likes_number = serializers.SerializerMethodField()
+    liked_by_me = serializers.SerializerMethodField()
+    following_author = serializers.BooleanField(read_only=True, default=False)
+    comments_number = serializers.IntegerField(source="comments_count", read_only=True)
+
     class Meta:
         model = Post
         fields = (
@@ -58,15 +70,31 @@ class PostListSerializer(PostSerializer):
             "author",
             "content",
             "image",
+            "image_variants",
             "hashtag",
             "likes_number",
             "comments_number",
+            "liked_by_me",
+            "following_author",
         )
 
+    def get_likes_number(self, instance) -> int:
+        """Likes count merged with likes pending in write-behind mode"""
+        pending = self.context.get("pending_likes", {}).get(instance.id)
+        return instance.likes_count + (pending.delta if pending else 0)
+
+    def get_liked_by_me(self, instance) -> bool:
+        """Like state of the request user merged with a pending like or unlike"""
+        pending = self.context.get("pending_likes", {}).get(instance.id)
+
+        if pending and pending.liked is not None:
+            return pending.liked
 
-class PostDetailSerializer(PostSerializer):
-    likes = LikeSerializer(many=True, read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
+        return getattr(instance, "liked_by_me", False)
+
+
+class PostDetailSerializer(PostListSerializer):
+    latest_comments = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -76,7 +104,20 @@ class PostDetailSerializer(PostSerializer):
             "author",
             "content",
             "image",
+            "image_variants",
             "hashtag",
-            "likes",
-            "comments",
+            "likes_number",
+            "comments_number",
+            "liked_by_me",
+            "following_author",
+            "latest_comments",
         )
+
+    def get_latest_comments(self, instance) -> list[dict]:
+        # Async views load the comments beforehand
+        comments = self.context.get("latest_comments")
+
+        if comments is None:
+            comments = instance.comments.all()[: settings.POST_DETAIL_COMMENTS_PREVIEW]
+
+        return CommentSerializer(comments, many=True).data
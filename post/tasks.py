@@ -1,9 +1,132 @@
 import datetime
 
-from post.models import Post
+from django.conf import settings
+
+from post.like_buffer import flush_likes
+from post.models import Post, TimelineEntry
+from social_media_api.cache import bump_versions
 from social_media_api.celery import app
+from social_media_api.images import refresh_variants
+from user.models import UserFollower
+
+
+@app.on_after_finalize.connect
+def setup_periodic_tasks(sender, **kwargs):
+    sender.add_periodic_task(
+        settings.POST_PUBLISH_INTERVAL,
+        publish_due_posts.s(),
+    )
+
+    if settings.LIKES_WRITE_BEHIND:
+        sender.add_periodic_task(
+            settings.LIKE_BUFFER_FLUSH_INTERVAL,
+            flush_buffered_likes.s(),
+        )
 
 
 @app.task
 def create_post(post_id: int, schedule_time: datetime) -> None:
+    # Kept for one-off tasks queued before the publish_at sweeper
     Post.objects.filter(pk=post_id).update(created_at=schedule_time, is_displayed=True)
+    fan_out_post(post_id)
+
+
+@app.task
+def publish_due_posts() -> None:
+    """Display scheduled posts whose publish time has come and fan them out"""
+    batch_size = settings.POST_PUBLISH_BATCH_SIZE
+
+    while True:
+        post_ids = Post.objects.publish_due(batch_size)
+
+        for post_id in post_ids:
+            fan_out_post.delay(post_id)
+
+        if len(post_ids) < batch_size:
+            break
+
+
+@app.task
+def fan_out_post(post_id: int) -> None:
+    """Add a displayed post to the timelines of its author and followers"""
+    post = Post.objects.filter(pk=post_id, is_displayed=True).first()
+
+    if post is None:
+        return
+
+    add_timeline_entries(
+        [TimelineEntry(user_id=post.author_id, post=post, created_at=post.created_at)]
+    )
+    followers = UserFollower.objects.filter(user_id=post.author_id).order_by(
+        "follower_id"
+    )
+    last_follower_id = 0
+
+    # Each batch of followers is read right before its insert, so users who
+    # unfollowed during the fan-out are skipped
+    while True:
+        follower_ids = list(
+            followers.filter(follower_id__gt=last_follower_id).values_list(
+                "follower_id", flat=True
+            )[: settings.TIMELINE_BATCH_SIZE]
+        )
+
+        if not follower_ids:
+            break
+
+        add_timeline_entries(
+            [
+                TimelineEntry(
+                    user_id=follower_id, post=post, created_at=post.created_at
+                )
+                for follower_id in follower_ids
+            ]
+        )
+        last_follower_id = follower_ids[-1]
+
+
+def add_timeline_entries(entries: list[TimelineEntry]) -> None:
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    bump_versions("feed", [entry.user_id for entry in entries])
+
+
+@app.task
+def backfill_timeline(user_id: int, author_id: int) -> None:
+    """Add the latest displayed posts of a followed author to the user timeline"""
+    # The user may have unfollowed before the task ran
+    if not UserFollower.objects.filter(user_id=author_id, follower_id=user_id).exists():
+        return
+
+    posts = Post.objects.filter(author_id=author_id, is_displayed=True).values_list(
+        "id", "created_at"
+    )[: settings.TIMELINE_BACKFILL_LIMIT]
+
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, created_at=created_at)
+            for post_id, created_at in posts
+        ],
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    bump_versions("feed", [user_id])
+
+
+@app.task
+def trim_timeline(user_id: int, author_id: int) -> None:
+    """Remove the posts of an unfollowed author from the user timeline"""
+    TimelineEntry.objects.filter(user_id=user_id, post__author_id=author_id).delete()
+    bump_versions("feed", [user_id])
+
+
+@app.task
+def flush_buffered_likes() -> None:
+    """Write likes buffered in write-behind mode to the database"""
+    flush_likes()
+
+
+@app.task
+def generate_post_image_variants(post_id: int) -> None:
+    """Generate resized and WebP variants of the post image"""
+    if refresh_variants(Post, post_id, "image", "image_variants"):
+        bump_versions("post", [post_id])
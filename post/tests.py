@@ -1,3 +1,188 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from post.like_buffer import flush_likes, get_like_buffer, record_like
+from post.models import Like, Post
+from social_media_api.cache import bump_versions, get_versions, is_cacheable
+from social_media_api.replicas import read_database
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Routing of reads to replica1, a mirror of the test database"""
+
+    databases = {"default", "replica1"}
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "reader@example.com", "password12345"
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def get_query_counts(self, method: str, path: str, **kwargs) -> dict[str, int]:
+        """Queries run on each database while handling the request"""
+        with CaptureQueriesContext(
+            connections["default"]
+        ) as default, CaptureQueriesContext(connections["replica1"]) as replica:
+            response = getattr(self.client, method)(path, **kwargs)
+
+        self.assertLess(response.status_code, 400)
+        return {"default": len(default), "replica1": len(replica)}
+
+    def test_safe_requests_read_from_replica(self):
+        queries = self.get_query_counts("get", "/api/posts/")
+
+        self.assertEqual(queries["default"], 0)
+        self.assertGreater(queries["replica1"], 0)
+
+    def test_views_without_use_replica_read_from_primary(self):
+        queries = self.get_query_counts("get", "/api/users/profile/")
+
+        self.assertGreater(queries["default"], 0)
+        self.assertEqual(queries["replica1"], 0)
+
+    def test_writes_go_to_primary_and_pin_the_writer(self):
+        queries = self.get_query_counts("post", "/api/posts/", data={"content": "Hi"})
+
+        self.assertGreater(queries["default"], 0)
+        self.assertEqual(queries["replica1"], 0)
+
+        queries = self.get_query_counts("get", "/api/posts/")
+
+        self.assertGreater(queries["default"], 0)
+        self.assertEqual(queries["replica1"], 0)
+
+    @override_settings(REPLICA_PIN_WINDOW=0)
+    def test_writers_are_not_pinned_after_the_window(self):
+        self.get_query_counts("post", "/api/posts/", data={"content": "Hi"})
+        queries = self.get_query_counts("get", "/api/posts/")
+
+        self.assertEqual(queries["default"], 0)
+        self.assertGreater(queries["replica1"], 0)
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        with mock.patch("social_media_api.replicas.get_replica_lag", return_value=60):
+            queries = self.get_query_counts("get", "/api/posts/")
+
+        self.assertGreater(queries["default"], 0)
+        self.assertEqual(queries["replica1"], 0)
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        with mock.patch("social_media_api.replicas.get_replica_lag", return_value=None):
+            queries = self.get_query_counts("get", "/api/posts/")
+
+        self.assertGreater(queries["default"], 0)
+        self.assertEqual(queries["replica1"], 0)
+
+    def test_replica_pages_are_not_cached_right_after_writes(self):
+        bump_versions("feed", [self.user.id])
+        versions = get_versions([f"version:feed:{self.user.id}"])
+        token = read_database.set("replica1")
+
+        try:
+            self.assertFalse(is_cacheable(versions))
+        finally:
+            read_database.reset(token)
+
+        self.assertTrue(is_cacheable(versions))
+
+
+@override_settings(LIKE_BUFFER_URL=None)
+class LikeBufferTests(TestCase):
+    """Write-behind likes with the process-local buffer"""
+
+    def setUp(self):
+        get_like_buffer.cache_clear()
+        self.addCleanup(get_like_buffer.cache_clear)
+        self.user = get_user_model().objects.create_user(
+            "liker@example.com", "password12345"
+        )
+        self.post = Post.objects.create(author=self.user, content="Hi")
+
+    def assertLiked(self, liked: bool, likes_count: int):
+        self.post.refresh_from_db()
+        self.assertEqual(
+            Like.objects.filter(post=self.post, user=self.user).exists(), liked
+        )
+        self.assertEqual(self.post.likes_count, likes_count)
+
+    def test_like_flush_unlike(self):
+        self.assertEqual(record_like(self.post.id, self.user.id, True), (1, True))
+        self.assertEqual(record_like(self.post.id, self.user.id, True), (1, False))
+        self.assertLiked(False, 0)
+
+        self.assertEqual(flush_likes(), 1)
+        self.assertLiked(True, 1)
+
+        self.assertEqual(record_like(self.post.id, self.user.id, False), (0, True))
+        self.assertEqual(flush_likes(), 1)
+        self.assertLiked(False, 0)
+
+    def test_like_and_unlike_before_flush_cancel_out(self):
+        record_like(self.post.id, self.user.id, True)
+        record_like(self.post.id, self.user.id, False)
+
+        flush_likes()
+        self.assertLiked(False, 0)
+
+    def test_failed_flush_is_requeued(self):
+        record_like(self.post.id, self.user.id, True)
+
+        with mock.patch.object(
+            Like.objects, "apply_buffered", side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            flush_likes()
+
+        pending = get_like_buffer().get_pending([self.post.id], self.user.id)
+        self.assertEqual(pending[self.post.id].liked, True)
+        self.assertEqual(pending[self.post.id].delta, 1)
+
+        self.assertEqual(flush_likes(), 1)
+        self.assertLiked(True, 1)
+
+    def test_changes_during_failed_flush_win_over_requeued_ones(self):
+        record_like(self.post.id, self.user.id, True)
+        buffer = get_like_buffer()
+        buffer.drain(10)
+        record_like(self.post.id, self.user.id, False)
+        buffer.requeue()
+
+        flush_likes()
+        self.assertLiked(False, 0)
+
+    def test_flush_completing_after_the_database_state_is_read(self):
+        """An unlike must not be dropped when a flush commits the like meanwhile"""
+        record_like(self.post.id, self.user.id, True)
+        buffer = get_like_buffer()
+        drained = buffer.drain(10)
+        get_state = Like.objects.get_state
+
+        def get_state_then_flush(post_id, user_id):
+            state = get_state(post_id, user_id)
+
+            if buffer.flushing:
+                Like.objects.apply_buffered(
+                    [(post_id, user_id) for user_id in drained[post_id][0]], []
+                )
+                buffer.complete()
+
+            return state
+
+        with mock.patch.object(
+            Like.objects, "get_state", side_effect=get_state_then_flush
+        ):
+            self.assertEqual(record_like(self.post.id, self.user.id, False), (0, True))
+
+        flush_likes()
+        self.assertLiked(False, 0)
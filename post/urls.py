@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework import routers
 
+from post import async_views
 from post.views import PostViewSet, CommentViewSet
 
 app_name = "post"
@@ -10,6 +11,10 @@ router.register("", PostViewSet, basename="post")
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("async/", async_views.post_list, name="post-list-async"),
+    path("async/<int:pk>/", async_views.post_detail, name="post-detail-async"),
+    path("async/<int:pk>/like/", async_views.post_like, name="post-like-async"),
+    path("async/<int:pk>/unlike/", async_views.post_unlike, name="post-unlike-async"),
     path(
         "<int:post_id>/comments/",
         CommentViewSet.as_view(actions={"get": "list", "post": "create"}),
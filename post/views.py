@@ -1,4 +1,8 @@
-from django.db.models import QuerySet, Q
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import QuerySet, Q, F, Exists, OuterRef, FloatField
+from django.db.models.functions import Cast
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, mixins, status
@@ -7,7 +11,8 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework.response import Response
 
-from post.models import Post, Comment, Like
+from post.like_buffer import get_like_buffer, record_like
+from post.models import Post, Comment, Like, TimelineEntry, normalize_hashtag
 from post.permissions import IsAuthor
 from post.serializers import (
     PostListSerializer,
@@ -15,9 +20,38 @@ from post.serializers import (
     PostSerializer,
     CommentSerializer,
     LikeSerializer,
+    PostLikeStateSerializer,
     PostScheduleSerializer,
 )
-from post.utils import schedule_post_display
+from post.tasks import fan_out_post, generate_post_image_variants
+from social_media_api.cache import (
+    bump_versions,
+    get_cached_response,
+    get_versions,
+    response_cache_key,
+    set_cached_response,
+    version_key,
+)
+from social_media_api.images import delete_variants_on_commit
+from social_media_api.pagination import KeysetPagination
+from user.models import UserFollower
+
+
+def annotate_viewer_state(queryset: QuerySet, user) -> QuerySet:
+    """Annotate whether the user liked each post and follows its author"""
+    return queryset.annotate(
+        liked_by_me=Exists(Like.objects.filter(post=OuterRef("pk"), user=user)),
+        following_author=Exists(
+            UserFollower.objects.filter(user=OuterRef("author"), follower=user)
+        ),
+    )
+
+
+def filter_visible(queryset: QuerySet, user) -> QuerySet:
+    """Posts of the user and of users they follow"""
+    return queryset.filter(
+        Q(author=user) | Q(author__id__in=user.followings.values("user_id"))
+    )
 
 
 class PostPagination(PageNumberPagination):
@@ -25,49 +59,107 @@ class PostPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class PostCursorPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+    page_number_pagination_class = PostPagination
+
+
+class LikePagination(PageNumberPagination):
+    page_size = 20
+    max_page_size = 100
+
+
+class LikeCursorPagination(KeysetPagination):
+    page_size = 20
+    ordering = ("-id",)
+    page_number_pagination_class = LikePagination
+
+
+class PostSearchPagination(KeysetPagination):
+    ordering = ("-rank", "-id")
+
+
 class PostViewSet(viewsets.ModelViewSet):
-    pagination_class = PostPagination
+    pagination_class = PostCursorPagination
+    use_replica = True
+    lookup_value_regex = r"\d+"
 
     def get_serializer_class(self) -> PostSerializer:
-        if self.action == "list":
+        if self.action in ("list", "search"):
             return PostListSerializer
         if self.action == "retrieve":
             return PostDetailSerializer
-        if self.action == "like":
+        if self.action in ("like", "unlike"):
+            return PostLikeStateSerializer
+        if self.action == "likes":
             return LikeSerializer
         if self.action == "schedule":
             return PostScheduleSerializer
         return PostSerializer
 
     def get_queryset(self) -> QuerySet:
-        queryset = Post.objects.prefetch_related("likes", "comments").filter(
-            is_displayed=True
-        )
+        queryset = Post.objects.filter(is_displayed=True)
         hashtag = self.request.query_params.get("hashtag")
 
-        if self.action in ("retrieve", "list", "like", "unlike"):
-            queryset = queryset.filter(
-                Q(author=self.request.user)
-                | Q(author__id__in=self.request.user.followings.values("user_id"))
-            )
+        if self.action in ("list", "retrieve", "search"):
+            queryset = annotate_viewer_state(queryset, self.request.user)
+
+        if self.action == "list":
+            return queryset
+
+        if self.action in ("retrieve", "likes", "search"):
+            queryset = filter_visible(queryset, self.request.user)
 
             if hashtag:
-                queryset = queryset.filter(hashtag__icontains=hashtag)
+                queryset = queryset.filter(hashtags__name=normalize_hashtag(hashtag))
         else:
             queryset = queryset.filter(author=self.request.user)
 
         return queryset
 
+    def get_serializer_context(self) -> dict:
+        context = super().get_serializer_context()
+        context["pending_likes"] = getattr(self, "pending_likes", {})
+        return context
+
+    def load_pending_likes(self, post_ids: list[int]) -> None:
+        """Load likes pending in write-behind mode to merge them into responses"""
+        if settings.LIKES_WRITE_BEHIND and post_ids:
+            self.pending_likes = get_like_buffer().get_pending(
+                post_ids, self.request.user.id
+            )
+
     def get_permissions(self) -> list[BasePermission]:
         if self.action in ("update", "partial_update", "destroy"):
             return [IsAuthor()]
         return [IsAuthenticated()]
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        fan_out_post.delay(post.id)
+
+        if post.image:
+            generate_post_image_variants.delay(post.id)
+
+    def perform_update(self, serializer):
+        if "image" not in serializer.validated_data:
+            post = serializer.save()
+            bump_versions("post", [post.id])
+            return
+
+        # Variants of the replaced image must not be served meanwhile
+        delete_variants_on_commit(serializer.instance.image_variants)
+        post = serializer.save(image_variants={})
+        bump_versions("post", [post.id])
+        generate_post_image_variants.delay(post.id)
+
+    def perform_destroy(self, instance):
+        post_id = instance.id
+        instance.delete()
+        bump_versions("post", [post_id])
 
     @extend_schema(
-        methods=["POST"], request=None, responses={200: PostDetailSerializer}
+        methods=["POST"], request=None, responses={200: PostLikeStateSerializer}
     )
     @action(
         methods=["POST"],
@@ -76,18 +168,15 @@ class PostViewSet(viewsets.ModelViewSet):
         url_name="post-like",
     )
     def like(self, request, pk=None) -> Response:
-        """Endpoint for post like. Returns the post detail"""
-        post = self.get_object()
-        user = self.request.user
-        serializer = LikeSerializer(data={"post": post.id, "user": user.id})
-
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        read_serializer = PostDetailSerializer(self.get_object())
-        return Response(read_serializer.data, status=status.HTTP_200_OK)
+        """Endpoint for post like. Returns the like state and likes count"""
+        if settings.LIKES_WRITE_BEHIND:
+            result = record_like(pk, request.user.id, liked=True)
+        else:
+            result = Like.objects.like(post_id=pk, user_id=request.user.id)
+        return self.like_state_response(pk, result, liked=True)
 
     @extend_schema(
-        methods=["POST"], request=None, responses={200: PostDetailSerializer}
+        methods=["POST"], request=None, responses={200: PostLikeStateSerializer}
     )
     @action(
         methods=["POST"],
@@ -96,24 +185,157 @@ class PostViewSet(viewsets.ModelViewSet):
         url_name="post-unlike",
     )
     def unlike(self, request, pk=None) -> Response:
-        """Endpoint for post unlike. Returns the post detail"""
+        """Endpoint for post unlike. Returns the like state and likes count"""
+        if settings.LIKES_WRITE_BEHIND:
+            result = record_like(pk, request.user.id, liked=False)
+        else:
+            result = Like.objects.unlike(post_id=pk, user_id=request.user.id)
+        return self.like_state_response(pk, result, liked=False)
+
+    @staticmethod
+    def like_state_response(pk, result: tuple | None, liked: bool) -> Response:
+        if result is None:
+            raise Http404
+
+        likes_count, changed = result
+
+        if changed:
+            bump_versions("post", [pk])
+
+        serializer = PostLikeStateSerializer(
+            {"liked": liked, "likes_count": likes_count}
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @extend_schema(responses={200: LikeSerializer(many=True)})
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="likes",
+        url_name="post-likes",
+        pagination_class=LikeCursorPagination,
+    )
+    def likes(self, request, pk=None) -> Response:
+        """Endpoint for the paginated list of post likes"""
         post = self.get_object()
-        user = self.request.user
-        Like.objects.filter(post=post, user=user).delete()
-        read_serializer = PostDetailSerializer(self.get_object())
-        return Response(read_serializer.data, status=status.HTTP_200_OK)
+        page = self.paginate_queryset(Like.objects.filter(post=post))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @extend_schema(
         parameters=[
             OpenApiParameter(
                 "hashtag",
                 type=str,
-                description="Filter posts by hashtag",
+                description="Filter posts by hashtag (case insensitive)",
+            ),
+            OpenApiParameter(
+                "hashtag_prefix",
+                type=str,
+                description="Filter posts by hashtags starting with the prefix",
             ),
         ]
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        """Read post ids from the request user timeline and hydrate the page"""
+        cache_key = response_cache_key("post-list", request, request.user.id)
+        data = get_cached_response("post-list", cache_key)
+
+        if data is not None:
+            return Response(data)
+
+        versions = get_versions([version_key("feed", request.user.id)])
+        entries = TimelineEntry.objects.filter(user=request.user).order_by(
+            "-created_at", "-post_id"
+        )
+        hashtag = request.query_params.get("hashtag")
+        hashtag_prefix = request.query_params.get("hashtag_prefix")
+
+        if hashtag:
+            entries = entries.filter(post__hashtags__name=normalize_hashtag(hashtag))
+
+        if hashtag_prefix:
+            entries = entries.filter(
+                Exists(
+                    Post.hashtags.through.objects.filter(
+                        post_id=OuterRef("post_id"),
+                        hashtag__name__startswith=normalize_hashtag(hashtag_prefix),
+                    )
+                )
+            )
+
+        page = self.paginate_queryset(entries.only("post_id", "created_at"))
+        post_ids = [entry.post_id for entry in page]
+        versions.update(
+            get_versions([version_key("post", post_id) for post_id in post_ids])
+        )
+        # Entries of unfollowed authors may outlive a trim racing a fan-out
+        posts = filter_visible(self.get_queryset(), request.user).in_bulk(post_ids)
+        self.load_pending_likes(post_ids)
+        serializer = self.get_serializer(
+            [posts[post_id] for post_id in post_ids if post_id in posts],
+            many=True,
+        )
+        response = self.get_paginated_response(serializer.data)
+        set_cached_response(cache_key, response.data, versions)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        cache_key = response_cache_key("post-detail", request, request.user.id)
+        data = get_cached_response("post-detail", cache_key)
+
+        if data is not None:
+            return Response(data)
+
+        versions = get_versions(
+            [
+                version_key("post", kwargs["pk"]),
+                version_key("feed", request.user.id),
+            ]
+        )
+        self.load_pending_likes([int(kwargs["pk"])])
+        response = super().retrieve(request, *args, **kwargs)
+        set_cached_response(cache_key, response.data, versions)
+        return response
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                type=str,
+                required=True,
+                description="Search query (web search syntax)",
+            ),
+        ]
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="search",
+        url_name="post-search",
+        pagination_class=PostSearchPagination,
+    )
+    def search(self, request, *args, **kwargs) -> Response:
+        """Endpoint for full-text search in visible posts ranked by relevance"""
+        query_text = request.query_params.get("q")
+
+        if not query_text:
+            return Response(
+                data={"message": "Search query q is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        query = SearchQuery(query_text, config="english", search_type="websearch")
+        # Rank is cast to double precision so that cursor values round-trip
+        queryset = (
+            self.get_queryset()
+            .filter(search_vector=query)
+            .annotate(rank=Cast(SearchRank(F("search_vector"), query), FloatField()))
+            .order_by("-rank", "-id")
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(
         methods=["POST"],
@@ -125,10 +347,11 @@ class PostViewSet(viewsets.ModelViewSet):
         """Endpoint for scheduling posts in UTC"""
         serializer = PostScheduleSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        schedule_time = serializer.initial_data["schedule_time"]
-        serializer.validated_data["author"] = request.user
-        post = serializer.save()
-        schedule_post_display(schedule_time=schedule_time, post_id=post.id)
+        post = serializer.save(author=request.user)
+
+        if post.image:
+            generate_post_image_variants.delay(post.id)
+
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -137,6 +360,11 @@ class CommentPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class CommentCursorPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+    page_number_pagination_class = CommentPagination
+
+
 class CommentViewSet(
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
@@ -145,12 +373,22 @@ class CommentViewSet(
     viewsets.GenericViewSet,
 ):
     serializer_class = CommentSerializer
-    pagination_class = CommentPagination
+    pagination_class = CommentCursorPagination
+    use_replica = True
     lookup_field = "id"
 
     def perform_create(self, serializer):
         post = get_object_or_404(Post, pk=self.kwargs.get("post_id"))
         serializer.save(author=self.request.user, post=post)
+        Post.objects.filter(pk=post.id).update(comments_count=F("comments_count") + 1)
+        bump_versions("post", [post.id])
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F("comments_count") - 1
+        )
+        bump_versions("post", [instance.post_id])
 
     def get_permissions(self) -> list[BasePermission]:
         if self.action == "destroy":
@@ -160,5 +398,6 @@ class CommentViewSet(
     def get_queryset(self) -> QuerySet:
         return Comment.objects.select_related("author", "post").filter(
             Q(post__author=self.request.user)
-            | Q(post__author_id__in=self.request.user.followings.values("user_id"))
+            | Q(post__author_id__in=self.request.user.followings.values("user_id")),
+            post_id=self.kwargs.get("post_id"),
         )
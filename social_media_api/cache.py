@@ -0,0 +1,182 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from social_media_api.metrics import CACHE_LOOKUPS
+from social_media_api.replicas import read_database
+
+RESPONSE_CACHE_NAMES = ("post-list", "post-detail", "user-detail")
+
+
+def version_key(kind: str, object_id: int) -> str:
+    return f"version:{kind}:{object_id}"
+
+
+def new_version() -> str:
+    """Unique version prefixed with the time it was created at"""
+    return f"{time.time():.3f}:{uuid.uuid4().hex}"
+
+
+def get_version_time(version: str) -> float:
+    created_at, separator, _ = version.partition(":")
+    return float(created_at) if separator else 0
+
+
+def bump_versions(kind: str, object_ids) -> None:
+    """Invalidate cached responses depending on the given objects"""
+    cache.set_many(
+        {version_key(kind, object_id): new_version() for object_id in object_ids},
+        timeout=settings.RESPONSE_CACHE_VERSION_TIMEOUT,
+    )
+
+
+async def abump_versions(kind: str, object_ids) -> None:
+    await cache.aset_many(
+        {version_key(kind, object_id): new_version() for object_id in object_ids},
+        timeout=settings.RESPONSE_CACHE_VERSION_TIMEOUT,
+    )
+
+
+def get_versions(keys: list[str]) -> dict[str, str]:
+    """Return current versions of the version keys creating missing ones"""
+    versions = cache.get_many(keys)
+
+    if len(versions) < len(keys):
+        for key in keys:
+            if key not in versions:
+                cache.add(
+                    key,
+                    new_version(),
+                    timeout=settings.RESPONSE_CACHE_VERSION_TIMEOUT,
+                )
+        versions = cache.get_many(keys)
+
+    return versions
+
+
+async def aget_versions(keys: list[str]) -> dict[str, str]:
+    versions = await cache.aget_many(keys)
+
+    if len(versions) < len(keys):
+        for key in keys:
+            if key not in versions:
+                await cache.aadd(
+                    key,
+                    new_version(),
+                    timeout=settings.RESPONSE_CACHE_VERSION_TIMEOUT,
+                )
+        versions = await cache.aget_many(keys)
+
+    return versions
+
+
+def response_cache_key(name: str, request, user_id: int | None = None) -> str:
+    url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f"response:{name}:{user_id}:{url_hash}"
+
+
+def stats_key(name: str, result: str) -> str:
+    return f"response_cache_stats:{name}:{result}"
+
+
+def record_lookup(name: str, result: str) -> None:
+    CACHE_LOOKUPS.labels(name, result).inc()
+    key = stats_key(name, result)
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+async def arecord_lookup(name: str, result: str) -> None:
+    CACHE_LOOKUPS.labels(name, result).inc()
+    key = stats_key(name, result)
+
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 1, timeout=None)
+
+
+def get_stats() -> dict[str, dict[str, int]]:
+    keys = {
+        (name, result): stats_key(name, result)
+        for name in RESPONSE_CACHE_NAMES
+        for result in ("hit", "miss")
+    }
+    values = cache.get_many(keys.values())
+    stats = {name: {"hit": 0, "miss": 0} for name in RESPONSE_CACHE_NAMES}
+
+    for (name, result), key in keys.items():
+        stats[name][result] = values.get(key, 0)
+
+    return stats
+
+
+def get_cached_response(name: str, key: str):
+    """Return cached response data if none of its versions has changed"""
+    entry = cache.get(key)
+
+    if entry is not None and cache.get_many(entry["versions"]) == entry["versions"]:
+        record_lookup(name, "hit")
+        return entry["data"]
+
+    record_lookup(name, "miss")
+    return None
+
+
+async def aget_cached_response(name: str, key: str):
+    entry = await cache.aget(key)
+
+    if entry is not None and (
+        await cache.aget_many(entry["versions"]) == entry["versions"]
+    ):
+        await arecord_lookup(name, "hit")
+        return entry["data"]
+
+    await arecord_lookup(name, "miss")
+    return None
+
+
+def is_cacheable(versions: dict[str, str]) -> bool:
+    """
+    Whether data read after the versions may be cached. A replica may not
+    have replayed writes made within its maximum lag yet, data read from
+    it is cached only if all versions are older than that.
+    """
+    if read_database.get() is None:
+        return True
+
+    max_lag = settings.REPLICA_MAX_LAG + settings.REPLICA_LAG_CHECK_INTERVAL
+    created_at = max(map(get_version_time, versions.values()), default=0)
+    return time.time() - created_at > max_lag
+
+
+def set_cached_response(key: str, data, versions: dict[str, str]) -> None:
+    """
+    Cache response data with the versions it was built from.
+    Versions should be read before the data to never cache a stale page.
+    """
+    if not is_cacheable(versions):
+        return
+
+    cache.set(
+        key,
+        {"data": data, "versions": versions},
+        timeout=settings.RESPONSE_CACHE_TIMEOUT,
+    )
+
+
+async def aset_cached_response(key: str, data, versions: dict[str, str]) -> None:
+    if not is_cacheable(versions):
+        return
+
+    await cache.aset(
+        key,
+        {"data": data, "versions": versions},
+        timeout=settings.RESPONSE_CACHE_TIMEOUT,
+    )
@@ -9,3 +9,6 @@ app = Celery("social_media_api")
 app.config_from_object("social_media_api.celeryconfig")
 
 app.autodiscover_tasks()
+
+# Connect task metrics signal handlers once Django is configured
+app.conf.imports = ("social_media_api.metrics",)
@@ -0,0 +1,167 @@
+import functools
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+
+def open_image(file: FieldFile) -> Image.Image:
+    """Open an uploaded image applying its EXIF orientation"""
+    with file.open("rb"):
+        image = Image.open(file)
+        image.load()
+
+    return ImageOps.exif_transpose(image)
+
+
+def has_alpha(image: Image.Image) -> bool:
+    return image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+def encode_without_metadata(
+    image: Image.Image, image_format: str, quality: int
+) -> bytes:
+    """Encode an image without metadata (EXIF with GPS, ICC profile, comments)"""
+    if image_format == "JPEG":
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if has_alpha(image) else "RGB")
+
+    # A fresh image carries pixel data only, so no metadata is written
+    stripped = Image.new(image.mode, image.size)
+    stripped.putdata(image.getdata())
+
+    buffer = io.BytesIO()
+    stripped.save(buffer, format=image_format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def save_variant(image: Image.Image, name: str, image_format: str) -> dict:
+    """Save an image without metadata and return its storage name and dimensions"""
+    content = encode_without_metadata(
+        image, image_format, settings.IMAGE_VARIANT_QUALITY
+    )
+    name = default_storage.save(name, ContentFile(content))
+
+    return {"name": name, "width": image.width, "height": image.height}
+
+
+def generate_variants(file: FieldFile) -> dict:
+    """
+    Generate resized and WebP variants of an uploaded image next to it.
+    Return a map of variant names to their storage names and dimensions.
+    """
+    image = open_image(file)
+    root, _ = os.path.splitext(file.name)
+    image_format, extension = ("PNG", ".png") if has_alpha(image) else ("JPEG", ".jpg")
+    variants = {"original": {"width": image.width, "height": image.height}}
+
+    for variant, max_size in settings.IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((max_size, max_size), Image.LANCZOS)
+        variants[variant] = save_variant(
+            resized, f"{root}-{variant}{extension}", image_format
+        )
+        variants[f"{variant}_webp"] = save_variant(
+            resized, f"{root}-{variant}.webp", "WEBP"
+        )
+
+    return variants
+
+
+def refresh_variants(model, pk: int, field: str, variants_field: str) -> bool:
+    """
+    Regenerate variants of an image field and delete the previous ones.
+    Returns False if the object is gone or its image changed meanwhile.
+    """
+    instance = model.objects.filter(pk=pk).only(field, variants_field).first()
+
+    if instance is None:
+        return False
+
+    file = getattr(instance, field)
+    variants = generate_variants(file) if file else {}
+    updated = model.objects.filter(pk=pk, **{field: file.name}).update(
+        **{variants_field: variants}
+    )
+
+    if not updated:
+        delete_variants(variants)
+        return False
+
+    delete_variants(getattr(instance, variants_field))
+    return True
+
+
+def get_variant_source(name: str) -> str:
+    """Name without extension of the image a variant was generated from"""
+    root, _ = os.path.splitext(name)
+
+    for variant in settings.IMAGE_VARIANTS:
+        if root.endswith(f"-{variant}"):
+            return root[: -len(variant) - 1]
+
+    return root
+
+
+def delete_variants(variants: dict) -> None:
+    for variant in variants.values():
+        if "name" in variant:
+            default_storage.delete(variant["name"])
+
+
+def delete_variants_on_commit(variants: dict) -> None:
+    """Delete variant files once the change replacing them is committed"""
+    if variants:
+        transaction.on_commit(functools.partial(delete_variants, variants))
+
+
+class StrippedImageField(serializers.ImageField):
+    """
+    Image upload re-encoded in its format without metadata, with its EXIF
+    orientation applied, as the original is served to other users as well
+    """
+
+    def to_internal_value(self, data) -> ContentFile:
+        file = super().to_internal_value(data)
+        file.seek(0)
+
+        with Image.open(file) as image:
+            image_format = image.format
+            content = encode_without_metadata(
+                ImageOps.exif_transpose(image),
+                image_format,
+                settings.IMAGE_ORIGINAL_QUALITY,
+            )
+
+        return ContentFile(content, name=file.name)
+
+
+@extend_schema_field(OpenApiTypes.OBJECT)
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Variant map with absolute URLs of the generated image variants"""
+
+    def to_representation(self, value: dict) -> dict:
+        request = self.context.get("request")
+        representation = {}
+
+        for variant, data in value.items():
+            representation[variant] = dict(data)
+
+            if "name" in data:
+                url = default_storage.url(representation[variant].pop("name"))
+                representation[variant]["url"] = (
+                    request.build_absolute_uri(url) if request else url
+                )
+
+        return representation
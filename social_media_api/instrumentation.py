@@ -0,0 +1,200 @@
+import contextlib
+import contextvars
+import json
+import logging
+import random
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+current_metrics = contextvars.ContextVar("current_metrics", default=None)
+query_observers = contextvars.ContextVar("query_observers", default=())
+
+
+class RequestMetrics:
+    """SQL, serializer and total timings of a single request"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.view = None
+        self.queries = Counter()
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    @property
+    def query_count(self) -> int:
+        return sum(self.queries.values())
+
+    @property
+    def duplicate_count(self) -> int:
+        """Queries repeating an already executed statement, an N+1 signal"""
+        return self.query_count - len(self.queries)
+
+    def record_query(self, sql: str, duration: float) -> None:
+        self.db_time += duration
+        self.queries[sql] += 1
+
+    def as_dict(self, request, response) -> dict:
+        return {
+            "view": self.view,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round((time.perf_counter() - self.started_at) * 1000, 2),
+            "db_ms": round(self.db_time * 1000, 2),
+            "queries": self.query_count,
+            "duplicate_queries": self.duplicate_count,
+            "serializer_ms": round(self.serializer_time * 1000, 2),
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper reporting queries to the observers of the current request"""
+    observers = query_observers.get()
+
+    if not observers:
+        return execute(sql, params, many, context)
+
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started_at
+        for observer in observers:
+            observer(sql, duration)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Installed once per connection: connections are thread-local and async
+    # views run queries in other threads, the context variable follows them
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextlib.contextmanager
+def observe_queries(observer):
+    """Call observer(sql, duration) for every query of the current request"""
+    token = query_observers.set(query_observers.get() + (observer,))
+    try:
+        yield
+    finally:
+        query_observers.reset(token)
+
+
+class HybridMiddleware:
+    """Middleware base running in sync or async mode like the view chain"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        with self.observe(request) as finish:
+            response = self.get_response(request)
+
+        return finish(response)
+
+    async def __acall__(self, request):
+        with self.observe(request) as finish:
+            response = await self.get_response(request)
+
+        return finish(response)
+
+    @contextlib.contextmanager
+    def observe(self, request):
+        """Yield a function completing the response"""
+        yield lambda response: response
+
+
+def get_view_name(request) -> str | None:
+    """View class and action name, e.g. PostViewSet.list"""
+    if request.resolver_match is None:
+        return None
+
+    view_func = request.resolver_match.func
+    view_class = getattr(view_func, "cls", None)
+
+    if view_class is None:
+        return f"{view_func.__module__}.{view_func.__name__}"
+
+    action = (getattr(view_func, "actions", None) or {}).get(request.method.lower())
+    return f"{view_class.__name__}.{action or request.method.lower()}"
+
+
+def server_timing(data: dict) -> str:
+    return ", ".join(
+        (
+            f'view;desc="{data["view"]}"',
+            f'db;dur={data["db_ms"]};desc="{data["queries"]} queries, '
+            f'{data["duplicate_queries"]} duplicate"',
+            f'serializer;dur={data["serializer_ms"]}',
+            f'total;dur={data["duration_ms"]}',
+        )
+    )
+
+
+class InstrumentationMiddleware(HybridMiddleware):
+    """
+    Record SQL query count, DB time, duplicate queries and serializer time
+    of a sample of requests. Results are sent as Server-Timing headers and
+    logged as JSON lines keyed by view class and action.
+    """
+
+    @contextlib.contextmanager
+    def observe(self, request):
+        if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+            yield lambda response: response
+            return
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+
+        def finish(response):
+            metrics.view = get_view_name(request)
+            data = metrics.as_dict(request, response)
+            response["Server-Timing"] = server_timing(data)
+            logger.info(json.dumps(data))
+            return response
+
+        try:
+            with observe_queries(metrics.record_query):
+                yield finish
+        finally:
+            current_metrics.reset(token)
+
+
+class InstrumentedSerializerMixin:
+    """Add the representation time of the serializer to the request metrics"""
+
+    def to_representation(self, instance):
+        metrics = current_metrics.get()
+
+        if metrics is None:
+            return super().to_representation(instance)
+
+        # Only the outermost serializer is timed, nested ones are part of it
+        metrics.serializer_depth += 1
+        started_at = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_depth -= 1
+            if metrics.serializer_depth == 0:
+                metrics.serializer_time += time.perf_counter() - started_at
@@ -0,0 +1,246 @@
+import mimetypes
+import os
+import re
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Q
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date
+from drf_spectacular.utils import extend_schema
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.views import APIView
+
+from post.models import Post
+from post.views import filter_visible
+from social_media_api.images import get_variant_source
+from user.authentication import CachedJWTAuthentication
+
+# Upload names contain a uuid4 (see post_image_file_path and
+# user_image_file_path), so their content never changes
+HASHED_NAME_PATTERN = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{32,}"
+)
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+POST_IMAGES_DIR = "uploads/post_images/"
+PROFILE_PICTURES_DIR = "uploads/profile_pictures/"
+
+signer = signing.Signer(salt="social_media_api.media")
+
+
+def get_signature(name: str, expires: int) -> str:
+    return signer.signature(f"{name}:{expires}")
+
+
+def sign(name: str) -> dict:
+    """
+    Query parameters granting read access to the file. The expiry is
+    rounded so URLs stay the same (and cacheable) for MEDIA_URL_MAX_AGE
+    """
+    max_age = settings.MEDIA_URL_MAX_AGE
+    expires = (int(time.time()) // max_age + 2) * max_age
+    return {"expires": expires, "signature": get_signature(name, expires)}
+
+
+def has_valid_signature(request, path: str) -> bool:
+    expires = request.GET.get("expires", "")
+
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+
+    return constant_time_compare(
+        request.GET.get("signature", ""), get_signature(path, int(expires))
+    )
+
+
+def can_view(user, path: str) -> bool:
+    """Whether the user can see the object owning the media file"""
+    if path.startswith(PROFILE_PICTURES_DIR):
+        return True
+
+    if path.startswith(POST_IMAGES_DIR):
+        # Same rule as the post endpoints, scheduled posts only for the author
+        posts = Post.objects.filter(image__startswith=f"{get_variant_source(path)}.")
+        return (
+            filter_visible(posts, user)
+            .filter(Q(is_displayed=True) | Q(author=user))
+            .exists()
+        )
+
+    return False
+
+
+class SignedMediaStorage(FileSystemStorage):
+    """File system storage returning signed media URLs"""
+
+    def url(self, name: str) -> str:
+        return f"{super().url(name)}?{urlencode(sign(name))}"
+
+
+def get_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def get_cache_control(path: str) -> str:
+    if HASHED_NAME_PATTERN.search(os.path.basename(path)):
+        return f"private, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, immutable"
+    return "private, no-cache"
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Return the (start, end) bytes of a single range header, inclusive.
+    Raise ValueError if the range is not satisfiable.
+    Multiple ranges are not supported and the whole file is served.
+    """
+    match = RANGE_PATTERN.match(header.strip())
+
+    if match is None:
+        return None
+
+    start, end = match.groups()
+
+    if not start and not end:
+        return None
+
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+
+    return start, end
+
+
+def iter_file_range(file, start: int, length: int):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(FileResponse.block_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def offload_response(path: str, full_path: str) -> HttpResponse | None:
+    """Hand the file off to the front proxy if it is configured to serve it"""
+    if not settings.MEDIA_X_ACCEL_REDIRECT_PREFIX and not settings.MEDIA_X_SENDFILE:
+        return None
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    response = HttpResponse(content_type=content_type or "application/octet-stream")
+
+    if settings.MEDIA_X_ACCEL_REDIRECT_PREFIX:
+        response["X-Accel-Redirect"] = settings.MEDIA_X_ACCEL_REDIRECT_PREFIX + path
+    else:
+        response["X-Sendfile"] = full_path
+
+    return response
+
+
+def file_response(request, full_path: str, stat: os.stat_result) -> HttpResponse:
+    """Stream the file supporting conditional and single range requests"""
+    etag = get_etag(stat)
+    if_none_match = request.headers.get("If-None-Match", "")
+
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or (
+        if_none_match.strip() == "*"
+    ):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+
+    if if_range and if_range != etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, stat.st_size) if range_header else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return response
+
+    file = open(full_path, "rb")
+
+    if byte_range is None:
+        response = FileResponse(file)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_file_range(file, start, end - start + 1), status=206
+        )
+        content_type, _ = mimetypes.guess_type(full_path)
+        response["Content-Type"] = content_type or "application/octet-stream"
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    return response
+
+
+class MediaView(APIView):
+    """
+    Serve uploaded media for signed URLs, or to authenticated users who can
+    see the post or user owning the file
+    """
+
+    # Signed URLs must work whatever Authorization header the client sends,
+    # so the JWT is only checked for unsigned ones
+    authentication_classes = ()
+    permission_classes = ()
+
+    def get_authenticate_header(self, request) -> str:
+        return CachedJWTAuthentication().authenticate_header(request)
+
+    @extend_schema(exclude=True)
+    def get(self, request, path: str):
+        if not has_valid_signature(request, path):
+            result = CachedJWTAuthentication().authenticate(request)
+
+            if result is None:
+                raise NotAuthenticated()
+
+            request.user, request.auth = result
+
+            if not can_view(request.user, path):
+                raise Http404
+
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, path)
+        except ValueError:
+            raise Http404
+
+        if not os.path.isfile(full_path):
+            raise Http404
+
+        response = offload_response(path, full_path)
+
+        if response is None:
+            response = file_response(request, full_path, os.stat(full_path))
+
+        response["Accept-Ranges"] = "bytes"
+        response["Cache-Control"] = get_cache_control(path)
+        return response
@@ -0,0 +1,182 @@
+import contextlib
+import os
+import time
+
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+    worker_ready,
+)
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+from social_media_api.instrumentation import HybridMiddleware, observe_queries
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route, method and status",
+    ["route", "method", "status"],
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL queries per request by route",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+CACHE_LOOKUPS = Counter(
+    "response_cache_lookups_total",
+    "Response cache lookups by cache and result (hit or miss)",
+    ["cache", "result"],
+)
+TASK_RUNTIME = Histogram(
+    "celery_task_duration_seconds",
+    "Celery task runtime by task and state",
+    ["task", "state"],
+)
+TASK_FAILURES = Counter(
+    "celery_task_failures_total",
+    "Failed Celery tasks by task and exception",
+    ["task", "exception"],
+)
+TASK_QUEUE_LAG = Histogram(
+    "celery_task_queue_lag_seconds",
+    "Time between publishing a Celery task and its start",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time waiting for a pooled database connection",
+    ["alias"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Requests for a pooled database connection that timed out",
+    ["alias"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Pooled database connections by state (in_use or idle)",
+    ["alias", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_MAX_SIZE = Gauge(
+    "db_pool_max_size",
+    "Maximum number of pooled database connections",
+    ["alias"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_UTILIZATION = Gauge(
+    "db_pool_utilization",
+    "Share of the pooled database connections in use, per process",
+    ["alias"],
+    multiprocess_mode="liveall",
+)
+
+task_started_at = {}
+
+
+def get_registry() -> CollectorRegistry:
+    """Registry aggregating all processes in multiprocess mode"""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def mark_process_dead(pid: int) -> None:
+    """Stop counting live gauges of an exited process in multiprocess mode"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+def metrics_view(request):
+    """Prometheus exposition endpoint, disabled unless METRICS_TOKEN is set"""
+    token = settings.METRICS_TOKEN
+
+    if not token or not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Record latency and SQL query count histograms of every request"""
+
+    @contextlib.contextmanager
+    def observe(self, request):
+        queries = []
+        started_at = time.perf_counter()
+
+        def finish(response):
+            resolver_match = request.resolver_match
+            route = resolver_match.route if resolver_match else "unmatched"
+            REQUEST_LATENCY.labels(route, request.method, response.status_code).observe(
+                time.perf_counter() - started_at
+            )
+            REQUEST_QUERIES.labels(route).observe(len(queries))
+            return response
+
+        with observe_queries(lambda sql, duration: queries.append(duration)):
+            yield finish
+
+
+@before_task_publish.connect
+def add_published_at(headers=None, **kwargs):
+    headers["published_at"] = time.time()
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, task=None, **kwargs):
+    task_started_at[task_id] = time.perf_counter()
+    published_at = getattr(task.request, "published_at", None)
+
+    if published_at is not None:
+        TASK_QUEUE_LAG.labels(task.name).observe(max(time.time() - published_at, 0))
+
+
+@task_postrun.connect
+def observe_task_runtime(task_id=None, task=None, state=None, **kwargs):
+    started_at = task_started_at.pop(task_id, None)
+
+    if started_at is not None:
+        TASK_RUNTIME.labels(task.name, state).observe(time.perf_counter() - started_at)
+
+
+@task_failure.connect
+def count_task_failure(sender=None, exception=None, **kwargs):
+    TASK_FAILURES.labels(sender.name, type(exception).__name__).inc()
+
+
+@worker_ready.connect
+def start_worker_metrics_server(**kwargs):
+    if settings.CELERY_METRICS_PORT:
+        start_http_server(settings.CELERY_METRICS_PORT, registry=get_registry())
+
+
+@worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    """Celery runs this in the parent when a pool child process exits"""
+    mark_process_dead(pid)
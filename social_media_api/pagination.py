@@ -0,0 +1,197 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """Keep full microsecond precision of datetimes in cursors"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique ordering that skips COUNT and OFFSET.
+    The ordering is taken from the queryset order_by if it is set explicitly.
+    Page number pagination is used instead if the page query param is given
+    and page_number_pagination_class is set.
+    """
+
+    page_size = 10
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering = ("-created_at", "-id")
+    page_number_pagination_class = None
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None) -> list | None:
+        self.request = request
+        self.page_number_paginator = None
+
+        if self.page_number_pagination_class is not None:
+            paginator = self.page_number_pagination_class()
+            if paginator.page_query_param in request.query_params:
+                self.page_number_paginator = paginator
+                return paginator.paginate_queryset(queryset, request, view)
+
+        queryset = self.get_page_queryset(queryset, request)
+        return self.get_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request) -> list:
+        """Async cursor pagination. Page number pagination is not supported"""
+        self.page_number_paginator = None
+        queryset = self.get_page_queryset(queryset, request)
+        return self.get_page([item async for item in queryset])
+
+    def get_page_queryset(self, queryset: QuerySet, request) -> QuerySet:
+        """Queryset of the requested page with one extra item to detect the next"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(queryset)
+
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        return queryset[: self.page_size + 1]
+
+    def get_page(self, results: list) -> list:
+        self.has_next = len(results) > self.page_size
+        results = results[: self.page_size]
+        self.next_position = self.get_position(results[-1]) if self.has_next else None
+        return results
+
+    def get_paginated_response(self, data) -> Response:
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.get_paginated_response(data)
+
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema) -> dict:
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view) -> list[dict]:
+        parameters = [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+        if self.page_number_pagination_class is not None:
+            parameters.append(
+                {
+                    "name": self.page_number_pagination_class.page_query_param,
+                    "required": False,
+                    "in": "query",
+                    "description": "Page number. Switches to page number pagination.",
+                    "schema": {"type": "integer"},
+                }
+            )
+
+        return parameters
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset: QuerySet) -> tuple[str, ...]:
+        return tuple(queryset.query.order_by) or tuple(self.ordering)
+
+    def get_keyset_filter(self, position: list) -> Q:
+        """Build the lexicographic "after position" filter for the ordering"""
+        keyset_filter = Q()
+        equal = Q()
+
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            keyset_filter |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+
+        return keyset_filter
+
+    def get_position(self, item) -> list:
+        names = [field.lstrip("-") for field in self.ordering]
+
+        if isinstance(item, dict):
+            return [item[name] for name in names]
+
+        return [getattr(item, name) for name in names]
+
+    def get_next_link(self) -> str | None:
+        if self.next_position is None:
+            return None
+
+        cursor = json.dumps(self.next_position, cls=CursorJSONEncoder)
+        encoded = base64.urlsafe_b64encode(cursor.encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, queryset: QuerySet) -> list | None:
+        encoded = self.request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None
+
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            return [
+                self.to_python(queryset, field.lstrip("-"), value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def to_python(queryset: QuerySet, name: str, value):
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+
+        return field.to_python(value)
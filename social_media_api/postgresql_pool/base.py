@@ -0,0 +1,219 @@
+"""
+PostgreSQL backend keeping a pool of connections per process and alias.
+
+Django closes connections at the end of every request (CONN_MAX_AGE = 0),
+this backend returns them to the pool instead, so threads of a process
+share OPTIONS["pool"]["max_size"] connections and only wait for one when
+all of them are in use.
+"""
+import collections
+import functools
+import os
+import threading
+import time
+
+import psycopg2.extensions
+from django.db.backends.postgresql import base
+
+from social_media_api.metrics import (
+    DB_POOL_CONNECTIONS,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUTS,
+    DB_POOL_UTILIZATION,
+    DB_POOL_WAIT,
+)
+
+# Idle connections are health-checked before reuse only if they were idle
+# for more than health_check_idle seconds or released after a database error
+POOL_DEFAULTS = {
+    "max_size": 10,
+    "timeout": 10,
+    "max_lifetime": 60 * 60,
+    "health_check_idle": 30,
+}
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Thread-safe pool of at most max_size psycopg2 connections"""
+
+    def __init__(
+        self,
+        alias: str,
+        max_size: int,
+        timeout: float,
+        max_lifetime: int,
+        health_check_idle: float,
+    ):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_idle = health_check_idle
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.lock = threading.Lock()
+        # (connection, released_at) pairs of idle connections, the most
+        # recently used last
+        self.idle = collections.deque()
+        # Creation times of the connections the pool owns and ids of those
+        # currently handed out
+        self.created_at = {}
+        self.in_use = set()
+        DB_POOL_MAX_SIZE.labels(alias).set(max_size)
+        self.update_metrics()
+
+    def update_metrics(self) -> None:
+        in_use = len(self.in_use)
+        DB_POOL_CONNECTIONS.labels(self.alias, "in_use").set(in_use)
+        DB_POOL_CONNECTIONS.labels(self.alias, "idle").set(len(self.idle))
+        DB_POOL_UTILIZATION.labels(self.alias).set(in_use / self.max_size)
+
+    def is_expired(self, connection) -> bool:
+        created_at = self.created_at[id(connection)]
+        return time.monotonic() - created_at > self.max_lifetime
+
+    def acquire(self, connect, health_check: bool = False):
+        """
+        Return an idle connection or one created with connect(). Raise
+        OperationalError if none is released within timeout seconds
+        """
+        started_at = time.perf_counter()
+
+        if not self.slots.acquire(timeout=self.timeout):
+            DB_POOL_TIMEOUTS.labels(self.alias).inc()
+            raise base.Database.OperationalError(
+                f"No connection of the {self.alias} pool available "
+                f"within {self.timeout} seconds"
+            )
+
+        DB_POOL_WAIT.labels(self.alias).observe(time.perf_counter() - started_at)
+
+        try:
+            connection = self.get_idle(health_check)
+
+            if connection is None:
+                connection = connect()
+                with self.lock:
+                    self.created_at[id(connection)] = time.monotonic()
+        except BaseException:
+            self.slots.release()
+            raise
+
+        with self.lock:
+            self.in_use.add(id(connection))
+
+        self.update_metrics()
+        return connection
+
+    def get_idle(self, health_check: bool):
+        while True:
+            with self.lock:
+                if not self.idle:
+                    return None
+                connection, released_at = self.idle.pop()
+
+            if not self.is_expired(connection) and (
+                not health_check
+                or time.monotonic() - released_at <= self.health_check_idle
+                or self.is_usable(connection)
+            ):
+                return connection
+
+            self.discard(connection)
+
+    def is_usable(self, connection) -> bool:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except base.Database.Error:
+            return False
+        return True
+
+    def release(self, connection, errors_occurred: bool = False) -> None:
+        """
+        Return a connection handed out by the pool, rolling back open
+        transactions. Connections that had errors are kept only if they pass
+        a health check. Connections the pool does not own, e.g. inherited from
+        the parent process after a fork, are closed without freeing a slot.
+        """
+        with self.lock:
+            handed_out = id(connection) in self.in_use
+            self.in_use.discard(id(connection))
+
+        if not handed_out:
+            if id(connection) not in self.created_at:
+                self.discard(connection)
+            return
+
+        try:
+            status = connection.info.transaction_status
+
+            if status in (
+                psycopg2.extensions.TRANSACTION_STATUS_INTRANS,
+                psycopg2.extensions.TRANSACTION_STATUS_INERROR,
+            ):
+                connection.rollback()
+                status = connection.info.transaction_status
+
+            # Health checks of idle connections must not open transactions
+            if status == psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                connection.autocommit = True
+
+            if (
+                connection.closed
+                or status != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+                or self.is_expired(connection)
+                or (errors_occurred and not self.is_usable(connection))
+            ):
+                self.discard(connection)
+            else:
+                with self.lock:
+                    self.idle.append((connection, time.monotonic()))
+        except base.Database.Error:
+            self.discard(connection)
+        finally:
+            self.slots.release()
+            self.update_metrics()
+
+    def discard(self, connection) -> None:
+        with self.lock:
+            self.created_at.pop(id(connection), None)
+
+        try:
+            connection.close()
+        except base.Database.Error:
+            pass
+
+
+def get_pool(alias: str, options: dict) -> ConnectionPool:
+    """Pool of the alias in the current process, forked processes get new ones"""
+    key = (os.getpid(), alias)
+
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ConnectionPool(alias, **{**POOL_DEFAULTS, **options})
+        return pools[key]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    @property
+    def pool(self) -> ConnectionPool:
+        return get_pool(self.alias, self.settings_dict["OPTIONS"].get("pool", {}))
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(
+            functools.partial(super().get_new_connection, conn_params),
+            health_check=self.settings_dict["CONN_HEALTH_CHECKS"],
+        )
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection, self.errors_occurred)
@@ -0,0 +1,151 @@
+import contextlib
+import contextvars
+import logging
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from social_media_api.instrumentation import HybridMiddleware
+
+logger = logging.getLogger(__name__)
+
+read_database = contextvars.ContextVar("read_database", default=None)
+
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery()
+        OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+
+def pin_key(user_id: int) -> str:
+    return f"replica-pin:{user_id}"
+
+
+def pin_to_primary(user_id: int) -> None:
+    """Read from the primary for a while so the user sees their own writes"""
+    cache.set(pin_key(user_id), True, timeout=settings.REPLICA_PIN_WINDOW)
+
+
+def is_pinned(user_id: int) -> bool:
+    return cache.get(pin_key(user_id), False)
+
+
+def get_replica_lag(alias: str) -> float | None:
+    """Replication lag in seconds, None if the replica is unavailable"""
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            return float(cursor.fetchone()[0] or 0)
+    except DatabaseError:
+        logger.warning("Replica %s is unavailable", alias, exc_info=True)
+        return None
+
+
+def is_healthy(alias: str) -> bool:
+    """Whether the replica is up and lags at most REPLICA_MAX_LAG seconds"""
+    key = f"replica-lag:{alias}"
+    lag = cache.get(key)
+
+    if lag is None:
+        lag = get_replica_lag(alias)
+        # -1 marks an unavailable replica, None is a cache miss
+        lag = -1 if lag is None else lag
+        cache.set(key, lag, timeout=settings.REPLICA_LAG_CHECK_INTERVAL)
+
+    return 0 <= lag <= settings.REPLICA_MAX_LAG
+
+
+def choose_replica() -> str | None:
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if is_healthy(alias)]
+    return random.choice(replicas) if replicas else None
+
+
+def get_token_user_id(request) -> int | None:
+    """User id from the JWT of the request, without loading the user"""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = header and authentication.get_raw_token(header)
+
+    if raw_token is None:
+        return None
+
+    try:
+        token = authentication.get_validated_token(raw_token)
+    except InvalidToken:
+        return None
+
+    return token.get(api_settings.USER_ID_CLAIM)
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica chosen by ReplicaMiddleware for the current
+    request and everything else to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware(HybridMiddleware):
+    """
+    Route safe-method requests of views with use_replica = True to a healthy
+    replica unless the user wrote recently, and pin users to the primary
+    for REPLICA_PIN_WINDOW seconds after their writes
+    """
+
+    @contextlib.contextmanager
+    def observe(self, request):
+        try:
+            yield lambda response: self.pin_writer(request, response)
+        finally:
+            read_database.set(None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, "cls", view_func)
+
+        if (
+            not settings.DATABASE_REPLICAS
+            or request.method not in SAFE_METHODS
+            or not getattr(view, "use_replica", False)
+        ):
+            return None
+
+        user_id = get_token_user_id(request)
+
+        if user_id is None or not is_pinned(user_id):
+            read_database.set(choose_replica())
+
+        return None
+
+    def pin_writer(self, request, response):
+        user = getattr(request, "user", None)
+
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        ):
+            pin_to_primary(user.id)
+
+        return response
@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -26,6 +29,8 @@ SECRET_KEY = os.environ["DJANGO_SECRET_KEY"]
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
+TESTING = sys.argv[1:2] == ["test"]
+
 ALLOWED_HOSTS = ["127.0.0.1"]
 
 
@@ -38,6 +43,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "rest_framework_simplejwt.token_blacklist",
@@ -48,6 +54,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "social_media_api.metrics.MetricsMiddleware",
+    "social_media_api.instrumentation.InstrumentationMiddleware",
+    "social_media_api.replicas.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -91,6 +100,92 @@ DATABASES = {
     }
 }
 
+# Connections are checked before reuse. If DATABASE_POOL_SIZE is set, they
+# are shared by the threads of a process through a pool of that size (and
+# only checked after idling or errors) and DATABASE_POOL_TIMEOUT is the
+# maximum wait for one in seconds. Otherwise
+# every thread opens its own connection, closed after each request unless
+# DATABASE_CONN_MAX_AGE is set. Use the pool rather than
+# DATABASE_CONN_MAX_AGE under ASGI: each request runs in a new thread there,
+# so persistent connections are never reused and pile up until they expire.
+# Set DATABASE_TRANSACTION_POOLER=1 behind a transaction-level pooler
+# (e.g. PgBouncer with pool_mode = transaction), it disables server-side
+# cursors which do not survive between transactions.
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 0))
+
+DATABASES["default"].update(
+    CONN_HEALTH_CHECKS=True,
+    DISABLE_SERVER_SIDE_CURSORS=os.environ.get("DATABASE_TRANSACTION_POOLER") == "1",
+)
+
+# Tests drop their database, which pooled connections would keep open
+if DATABASE_POOL_SIZE and not TESTING:
+    DATABASES["default"].update(
+        ENGINE="social_media_api.postgresql_pool",
+        CONN_MAX_AGE=0,
+        OPTIONS={
+            "pool": {
+                "max_size": DATABASE_POOL_SIZE,
+                "timeout": float(os.environ.get("DATABASE_POOL_TIMEOUT", 10)),
+            }
+        },
+    )
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(
+        os.environ.get("DATABASE_CONN_MAX_AGE", 0)
+    )
+
+# Read replicas of the default database, POSTGRES_REPLICA_HOSTS is a comma
+# separated list of hosts. Safe-method requests of views with
+# use_replica = True read from a replica lagging at most REPLICA_MAX_LAG
+# seconds (checked every REPLICA_LAG_CHECK_INTERVAL seconds); users read
+# from the primary for REPLICA_PIN_WINDOW seconds after a write. Responses
+# read from a replica are cached only if the versions they depend on are
+# older than REPLICA_MAX_LAG + REPLICA_LAG_CHECK_INTERVAL seconds.
+# POSTGRES_REPLICA_HOSTS=$POSTGRES_HOST adds a second alias of the primary
+# to try the routing locally.
+DATABASE_REPLICAS = []
+
+for host in filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",")):
+    alias = f"replica{len(DATABASE_REPLICAS) + 1}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# Routing tests enable a mirror of the test database as a replica
+if TESTING and not DATABASE_REPLICAS:
+    DATABASES["replica1"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+
+DATABASE_ROUTERS = ["social_media_api.replicas.ReplicaRouter"]
+REPLICA_PIN_WINDOW = int(os.environ.get("REPLICA_PIN_WINDOW", 10))
+REPLICA_MAX_LAG = 5
+REPLICA_LAG_CHECK_INTERVAL = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+if os.environ.get("REDIS_CACHE_URL") and not TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_CACHE_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds to keep cached responses and the versions they depend on
+RESPONSE_CACHE_TIMEOUT = 60
+RESPONSE_CACHE_VERSION_TIMEOUT = 60 * 60 * 24
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -132,15 +227,28 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = "/vol/web/media"
 
+# Media is served by the front proxy after authorization: set an internal
+# nginx location prefix for X-Accel-Redirect, or enable X-Sendfile (Apache).
+# Without either Django streams the files itself.
+MEDIA_X_ACCEL_REDIRECT_PREFIX = os.environ.get("MEDIA_X_ACCEL_REDIRECT_PREFIX", "")
+MEDIA_X_SENDFILE = os.environ.get("MEDIA_X_SENDFILE") == "1"
+MEDIA_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+# Media URLs returned by the API are signed to load without the JWT header
+# (e.g. in <img src>) and stay valid for MEDIA_URL_MAX_AGE to 2x that seconds
+MEDIA_URL_MAX_AGE = 60 * 60
+
+STORAGES = {
+    "default": {"BACKEND": "social_media_api.media.SignedMediaStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("user.authentication.CachedJWTAuthentication",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
@@ -148,11 +256,87 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
+    "TOKEN_REFRESH_SERIALIZER": "user.serializers.CachedTokenRefreshSerializer",
+    "TOKEN_BLACKLIST_SERIALIZER": "user.serializers.CachedTokenBlacklistSerializer",
 }
 
+# Expired tokens are deleted daily in batches with a pause (seconds) between them
+TOKEN_CLEANUP_BATCH_SIZE = 1000
+TOKEN_CLEANUP_PAUSE = 0.5
+# Seconds a "not blacklisted" refresh token check stays cached
+TOKEN_BLACKLIST_CACHE_TIMEOUT = 60
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Social Media API",
     "DESCRIPTION": "API for a social media platform",
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
 }
+
+# Home timeline (fan-out on write)
+TIMELINE_BATCH_SIZE = 1000
+TIMELINE_BACKFILL_LIMIT = 500
+
+# Share of requests with SQL and serializer timings recorded
+# (Server-Timing header and "social_media_api.instrumentation" log lines)
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get("INSTRUMENTATION_SAMPLE_RATE", 0.01))
+
+# Prometheus metrics at /metrics for requests with the METRICS_TOKEN bearer
+# token, the endpoint is disabled without it. Set PROMETHEUS_MULTIPROC_DIR
+# (a directory shared by web and Celery processes, emptied before they
+# start) to aggregate multiple processes; gunicorn.conf.py and a Celery
+# signal mark exited processes dead. Celery workers also serve metrics on
+# CELERY_METRICS_PORT, meant for an internal network, if it is set.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+CELERY_METRICS_PORT = int(os.environ.get("CELERY_METRICS_PORT", 0))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "social_media_api.instrumentation": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
+    },
+}
+
+# Users resolved by JWT authentication are cached in the shared cache and
+# for a few seconds in a process-local LRU
+USER_AUTH_CACHE_TIMEOUT = 60 * 60
+USER_AUTH_LOCAL_CACHE_TIMEOUT = 5
+USER_AUTH_LOCAL_CACHE_SIZE = 1024
+
+# Scheduled posts are published by a sweeper task every POST_PUBLISH_INTERVAL
+# seconds in batches of POST_PUBLISH_BATCH_SIZE
+POST_PUBLISH_INTERVAL = 30
+POST_PUBLISH_BATCH_SIZE = 500
+
+# Uploaded images are re-encoded without metadata and get resized variants
+# (maximum side in pixels) in their original format and WebP, generated by
+# Celery tasks
+IMAGE_VARIANTS = {"thumbnail": 320, "medium": 1080}
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_ORIGINAL_QUALITY = 95
+
+# Number of latest comments embedded into the post detail
+POST_DETAIL_COMMENTS_PREVIEW = 3
+
+# Write-behind likes: likes are buffered in Redis at LIKE_BUFFER_URL (a
+# process-local buffer in tests) and flushed to the database every
+# LIKE_BUFFER_FLUSH_INTERVAL seconds by one worker at a time
+LIKES_WRITE_BEHIND = os.environ.get("LIKES_WRITE_BEHIND") == "1"
+LIKE_BUFFER_URL = os.environ.get("LIKE_BUFFER_URL")
+LIKE_BUFFER_FLUSH_INTERVAL = 5
+LIKE_BUFFER_FLUSH_BATCH = 500
+LIKE_BUFFER_FLUSH_LOCK_TIMEOUT = 60
+
+if LIKES_WRITE_BEHIND and not LIKE_BUFFER_URL and not TESTING:
+    # The process-local buffer would hide likes from the flushing worker
+    raise ImproperlyConfigured("LIKES_WRITE_BEHIND requires LIKE_BUFFER_URL")
+
+# Query count (and optional p95 latency) budgets of the benchmark command
+BENCHMARK_BUDGETS_FILE = BASE_DIR / "benchmark_budgets.json"
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.utils.translation import gettext as _
 
+from .authentication import invalidate_cached_user
 from .models import User
 
 
@@ -41,3 +42,27 @@ class UserAdmin(DjangoUserAdmin):
     list_display = ("email", "first_name", "last_name", "bio", "country", "is_staff")
     search_fields = ("email", "first_name", "last_name", "country")
     ordering = ("email",)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_cached_user(obj.id)
+
+    def delete_model(self, request, obj):
+        user_id = obj.id
+        super().delete_model(request, obj)
+        invalidate_cached_user(user_id)
+
+    def delete_queryset(self, request, queryset):
+        user_ids = list(queryset.values_list("id", flat=True))
+        super().delete_queryset(request, queryset)
+
+        for user_id in user_ids:
+            invalidate_cached_user(user_id)
+
+    def user_change_password(self, request, id, form_url=""):
+        response = super().user_change_password(request, id, form_url)
+
+        if request.method == "POST":
+            invalidate_cached_user(int(id))
+
+        return response
@@ -0,0 +1,180 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from social_media_api.cache import (
+    aget_versions,
+    bump_versions,
+    get_versions,
+    version_key,
+)
+
+
+class LocalUserCache:
+    """Process-local LRU of pickled users with a short TTL"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, user_id: int) -> bytes | None:
+        with self.lock:
+            entry = self.entries.get(user_id)
+
+            if entry is None:
+                return None
+
+            expires_at, data = entry
+
+            if expires_at < time.monotonic():
+                del self.entries[user_id]
+                return None
+
+            self.entries.move_to_end(user_id)
+            return data
+
+    def set(self, user_id: int, data: bytes) -> None:
+        with self.lock:
+            self.entries[user_id] = (
+                time.monotonic() + settings.USER_AUTH_LOCAL_CACHE_TIMEOUT,
+                data,
+            )
+            self.entries.move_to_end(user_id)
+
+            while len(self.entries) > settings.USER_AUTH_LOCAL_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def delete(self, user_id: int) -> None:
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+
+local_user_cache = LocalUserCache()
+
+
+def user_cache_key(user_id: int) -> str:
+    return f"auth_user:{user_id}"
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Make authentication load the user from the database again"""
+    local_user_cache.delete(user_id)
+    bump_versions("user_auth", [user_id])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication resolving users from a process-local LRU and
+    the shared cache. Shared entries are valid while the user_auth
+    version of the user is unchanged, see invalidate_cached_user.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        data = local_user_cache.get(user_id)
+
+        if data is None:
+            data = self.get_shared_user(user_id)
+            local_user_cache.set(user_id, data)
+
+        return self.load_user(data)
+
+    async def aauthenticate(self, request) -> tuple | None:
+        """authenticate() for async views"""
+        header = self.get_header(request)
+
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        data = local_user_cache.get(user_id)
+
+        if data is None:
+            data = await self.aget_shared_user(user_id)
+            local_user_cache.set(user_id, data)
+
+        return self.load_user(data)
+
+    @staticmethod
+    def get_user_id(validated_token) -> int:
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    @staticmethod
+    def load_user(data: bytes):
+        user = pickle.loads(data)
+
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
+
+    def get_shared_user(self, user_id: int) -> bytes:
+        """Return the pickled user (or None) for the current user version"""
+        auth_version_key = version_key("user_auth", user_id)
+        entries = cache.get_many([auth_version_key, user_cache_key(user_id)])
+        version = entries.get(auth_version_key)
+        entry = entries.get(user_cache_key(user_id))
+
+        if version is None:
+            version = get_versions([auth_version_key])[auth_version_key]
+
+        if entry is not None and entry["version"] == version:
+            return entry["data"]
+
+        user = self.user_model.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).first()
+        data = pickle.dumps(user)
+        cache.set(
+            user_cache_key(user_id),
+            {"version": version, "data": data},
+            timeout=settings.USER_AUTH_CACHE_TIMEOUT,
+        )
+        return data
+
+    async def aget_shared_user(self, user_id: int) -> bytes:
+        auth_version_key = version_key("user_auth", user_id)
+        entries = await cache.aget_many([auth_version_key, user_cache_key(user_id)])
+        version = entries.get(auth_version_key)
+        entry = entries.get(user_cache_key(user_id))
+
+        if version is None:
+            version = (await aget_versions([auth_version_key]))[auth_version_key]
+
+        if entry is not None and entry["version"] == version:
+            return entry["data"]
+
+        user = await self.user_model.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).afirst()
+        data = pickle.dumps(user)
+        await cache.aset(
+            user_cache_key(user_id),
+            {"version": version, "data": data},
+            timeout=settings.USER_AUTH_CACHE_TIMEOUT,
+        )
+        return data
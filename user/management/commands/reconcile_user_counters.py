@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from user.models import UserFollower
+
+
+def count_subquery(field: str) -> Coalesce:
+    counts = (
+        UserFollower.objects.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class Command(BaseCommand):
+    """Command to recompute stored followers and followings counters of users"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        users = get_user_model().objects
+        max_id = users.aggregate(max_id=Max("id"))["max_id"] or 0
+        updated = 0
+
+        for start in range(0, max_id + 1, batch_size):
+            updated += users.filter(id__gte=start, id__lt=start + batch_size).update(
+                followers_count=count_subquery("user"),
+                followings_count=count_subquery("follower"),
+            )
+            self.stdout.write(f"Reconciled users up to id {start + batch_size - 1}")
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {updated} users"))
@@ -0,0 +1,51 @@
+# Generated by Django 4.2 on 2026-10-18 05:50
+
+from django.db import migrations, models
+from django.db.models import Max
+
+BATCH_SIZE = 1000
+
+
+def backfill_user_counters(apps, schema_editor):
+    # Batches commit separately (the migration is not atomic), so rows are
+    # locked for one batch at a time
+    User = apps.get_model("user", "User")
+    last_id = User.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(0, last_id, BATCH_SIZE):
+            cursor.execute(
+                """
+                UPDATE user_user u
+                SET followers_count = (
+                    SELECT COUNT(*) FROM user_userfollower f WHERE f.user_id = u.id
+                ),
+                followings_count = (
+                    SELECT COUNT(*) FROM user_userfollower f WHERE f.follower_id = u.id
+                )
+                WHERE u.id > %s AND u.id <= %s
+                """,
+                [start, start + BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("user", "0005_user_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="followings_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_user_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0006_user_followers_count_user_followings_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="picture_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
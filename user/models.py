@@ -6,10 +6,16 @@ from django.contrib.auth.models import (
     AbstractUser,
     BaseUserManager,
 )
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.utils.text import slugify
 from django.utils.translation import gettext as _
 
+from social_media_api.images import delete_variants_on_commit
+
 
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
@@ -57,19 +63,48 @@ class User(AbstractUser):
     email = models.EmailField(_("email address"), unique=True)
     bio = models.TextField(null=True, blank=True)
     picture = models.ImageField(null=True, blank=True, upload_to=user_image_file_path)
+    # Filled by the generate_user_picture_variants task
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     country = models.CharField(max_length=100, null=True, blank=True)
+    followers_count = models.PositiveIntegerField(default=0)
+    followings_count = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            GinIndex(
+                fields=["first_name"],
+                name="user_first_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["last_name"],
+                name="user_last_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            # icontains compiles to UPPER(column) LIKE UPPER(%value%)
+            GinIndex(
+                OpClass(Upper("first_name"), name="gin_trgm_ops"),
+                name="user_first_name_upper_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("last_name"), name="gin_trgm_ops"),
+                name="user_last_name_upper_trgm_idx",
+            ),
+            models.Index(Upper("country"), name="user_country_upper_idx"),
+        ]
+
     def __str__(self) -> str:
         return self.get_full_name()
 
-    @property
-    def followers_number(self) -> int:
-        return self.followers.count()
+
+@receiver(post_delete, sender=User)
+def delete_user_picture_variants(sender, instance: User, **kwargs) -> None:
+    delete_variants_on_commit(instance.picture_variants)
 
 
 class UserFollower(models.Model):
@@ -1,7 +1,16 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-
+from rest_framework_simplejwt.serializers import (
+    TokenBlacklistSerializer,
+    TokenRefreshSerializer,
+)
+
+from post.models import Like
+from social_media_api.images import ImageVariantsField, StrippedImageField
+from social_media_api.instrumentation import InstrumentedSerializerMixin
+from user.authentication import invalidate_cached_user
 from user.models import UserFollower
+from user.tokens import CachedBlacklistRefreshToken
 
 
 class UserFollowSerializer(serializers.ModelSerializer):
@@ -10,7 +19,9 @@ class UserFollowSerializer(serializers.ModelSerializer):
         fields = ("id", "user", "follower")
 
 
-class UserFollowingsSerializer(serializers.ModelSerializer):
+class UserFollowingsSerializer(
+    InstrumentedSerializerMixin, serializers.ModelSerializer
+):
     user_id = serializers.IntegerField(source="user.id", read_only=True)
     user_full_name = serializers.CharField(source="user.get_full_name", read_only=True)
 
@@ -19,7 +30,7 @@ class UserFollowingsSerializer(serializers.ModelSerializer):
         fields = ("user_id", "user_full_name")
 
 
-class UserFollowersSerializer(serializers.ModelSerializer):
+class UserFollowersSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     follower_id = serializers.IntegerField(source="follower.id", read_only=True)
     follower_full_name = serializers.CharField(
         source="follower.get_full_name", read_only=True
@@ -42,6 +53,8 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
+    picture = StrippedImageField(required=False, allow_null=True)
+
     class Meta:
         model = get_user_model()
         fields = (
@@ -64,10 +77,19 @@ class UserUpdateSerializer(serializers.ModelSerializer):
             user.set_password(password)
             user.save()
 
+        invalidate_cached_user(user.id)
         return user
 
 
-class UserReadSerializer(serializers.ModelSerializer):
+class UserReadSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
+    picture_variants = ImageVariantsField()
+    followers_number = serializers.IntegerField(
+        source="followers_count", read_only=True
+    )
+    followings_number = serializers.IntegerField(
+        source="followings_count", read_only=True
+    )
+
     class Meta:
         model = get_user_model()
         fields = (
@@ -77,16 +99,23 @@ class UserReadSerializer(serializers.ModelSerializer):
             "bio",
             "country",
             "picture",
+            "picture_variants",
             "followers_number",
+            "followings_number",
         )
 
 
-class UserReadProfileSerializer(serializers.ModelSerializer):
-    followings = UserFollowingsSerializer(many=True, read_only=True)
-    followers = UserFollowersSerializer(many=True, read_only=True)
-    liked_posts = serializers.SlugRelatedField(
-        many=True, source="likes", read_only=True, slug_field="id"
+class UserReadProfileSerializer(
+    InstrumentedSerializerMixin, serializers.ModelSerializer
+):
+    picture_variants = ImageVariantsField()
+    followers_number = serializers.IntegerField(
+        source="followers_count", read_only=True
+    )
+    followings_number = serializers.IntegerField(
+        source="followings_count", read_only=True
     )
+    liked_posts_number = serializers.IntegerField(source="likes.count", read_only=True)
 
     class Meta:
         model = get_user_model()
@@ -97,7 +126,28 @@ class UserReadProfileSerializer(serializers.ModelSerializer):
             "bio",
             "country",
             "picture",
-            "followings",
-            "followers",
-            "liked_posts",
+            "picture_variants",
+            "followers_number",
+            "followings_number",
+            "liked_posts_number",
         )
+
+
+class UserLikedPostSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Like
+        fields = ("post",)
+
+
+class UserRelationshipSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField()
+    is_following = serializers.BooleanField()
+    followers_number = serializers.IntegerField()
+
+
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CachedBlacklistRefreshToken
+
+
+class CachedTokenBlacklistSerializer(TokenBlacklistSerializer):
+    token_class = CachedBlacklistRefreshToken
@@ -1,8 +1,21 @@
+import logging
+import time
+
 from celery.schedules import crontab
-from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
 from rest_framework_simplejwt.utils import aware_utcnow
 
+from social_media_api.cache import bump_versions
 from social_media_api.celery import app
+from social_media_api.images import refresh_variants
+
+logger = logging.getLogger(__name__)
 
 
 @app.on_after_finalize.connect
@@ -14,5 +27,47 @@ def setup_periodic_tasks(sender, **kwargs):
 
 
 @app.task
-def daily_clean_tokens():
-    OutstandingToken.objects.filter(expires_at__lte=aware_utcnow()).delete()
+def daily_clean_tokens() -> dict[str, int]:
+    """
+    Delete expired outstanding tokens with their blacklist entries in batches.
+    Every batch is committed separately, so an interrupted run is resumed
+    by the next one.
+    """
+    batch_size = settings.TOKEN_CLEANUP_BATCH_SIZE
+    now = aware_utcnow()
+    counts = {"outstanding_tokens": 0, "blacklisted_tokens": 0, "batches": 0}
+
+    while True:
+        token_ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+
+        if not token_ids:
+            break
+
+        with transaction.atomic():
+            blacklisted, _ = BlacklistedToken.objects.filter(
+                token_id__in=token_ids
+            ).delete()
+            outstanding, _ = OutstandingToken.objects.filter(id__in=token_ids).delete()
+
+        counts["blacklisted_tokens"] += blacklisted
+        counts["outstanding_tokens"] += outstanding
+        counts["batches"] += 1
+
+        if len(token_ids) < batch_size:
+            break
+
+        time.sleep(settings.TOKEN_CLEANUP_PAUSE)
+
+    logger.info("Cleaned expired tokens: %s", counts)
+    return counts
+
+
+@app.task
+def generate_user_picture_variants(user_id: int) -> None:
+    """Generate resized and WebP variants of the profile picture"""
+    if refresh_variants(get_user_model(), user_id, "picture", "picture_variants"):
+        bump_versions("user", [user_id])
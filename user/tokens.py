@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+
+def blacklist_cache_key(jti: str) -> str:
+    return f"token_blacklisted:{jti}"
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """Refresh token checking blacklist membership in the cache first"""
+
+    def get_remaining_lifetime(self) -> int:
+        expires_at = datetime_from_epoch(self.payload["exp"])
+        return max(int((expires_at - aware_utcnow()).total_seconds()), 1)
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        key = blacklist_cache_key(jti)
+        blacklisted = cache.get(key)
+
+        if blacklisted is None:
+            blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+            # Tokens blacklisted outside blacklist() (e.g. in the admin)
+            # are picked up once the negative entry expires
+            cache.set(
+                key,
+                blacklisted,
+                timeout=self.get_remaining_lifetime()
+                if blacklisted
+                else settings.TOKEN_BLACKLIST_CACHE_TIMEOUT,
+            )
+
+        if blacklisted:
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        cache.set(
+            blacklist_cache_key(self.payload[api_settings.JTI_CLAIM]),
+            True,
+            timeout=self.get_remaining_lifetime(),
+        )
+        return result
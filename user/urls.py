@@ -5,7 +5,13 @@ from rest_framework_simplejwt.views import (
     TokenBlacklistView,
 )
 
-from user.views import CreateUserView, ManageUserView, ReadUserView, UserFollowView
+from user.views import (
+    CreateUserView,
+    ManageUserView,
+    ReadUserView,
+    UserFollowView,
+    RelationCursorPagination,
+)
 
 app_name = "user"
 
@@ -26,12 +32,33 @@ urlpatterns = [
         ),
         name="manage",
     ),
+    path(
+        "profile/liked-posts/",
+        ManageUserView.as_view(
+            actions={"get": "liked_posts"}, pagination_class=RelationCursorPagination
+        ),
+        name="liked-posts",
+    ),
     path("", ReadUserView.as_view(actions={"get": "list"}), name="user-list"),
     path(
         "<int:pk>/",
         ReadUserView.as_view(actions={"get": "retrieve"}),
         name="user-detail",
     ),
+    path(
+        "<int:pk>/followers/",
+        ReadUserView.as_view(
+            actions={"get": "followers"}, pagination_class=RelationCursorPagination
+        ),
+        name="user-followers",
+    ),
+    path(
+        "<int:pk>/followings/",
+        ReadUserView.as_view(
+            actions={"get": "followings"}, pagination_class=RelationCursorPagination
+        ),
+        name="user-followings",
+    ),
     path(
         "<int:pk>/follow/",
         UserFollowView.as_view(actions={"post": "follow"}),
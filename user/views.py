@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import QuerySet
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import QuerySet, Q, F, FloatField
+from django.db.models.functions import Cast, Greatest
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import generics, viewsets, mixins, status
 from rest_framework.decorators import action
@@ -8,6 +10,18 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from post.tasks import backfill_timeline, trim_timeline
+from social_media_api.cache import (
+    bump_versions,
+    get_cached_response,
+    get_versions,
+    response_cache_key,
+    set_cached_response,
+    version_key,
+)
+from social_media_api.images import delete_variants_on_commit
+from social_media_api.pagination import KeysetPagination
+from user.authentication import invalidate_cached_user
 from user.models import UserFollower
 from user.serializers import (
     UserCreateSerializer,
@@ -15,13 +29,29 @@ from user.serializers import (
     UserReadSerializer,
     UserFollowSerializer,
     UserReadProfileSerializer,
+    UserFollowersSerializer,
+    UserFollowingsSerializer,
+    UserLikedPostSerializer,
+    UserRelationshipSerializer,
 )
+from user.tasks import generate_user_picture_variants
 
 
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserCreateSerializer
 
 
+class RelationPagination(PageNumberPagination):
+    page_size = 20
+    max_page_size = 100
+
+
+class RelationCursorPagination(KeysetPagination):
+    page_size = 20
+    ordering = ("-id",)
+    page_number_pagination_class = RelationPagination
+
+
 class ManageUserView(
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
@@ -31,34 +61,101 @@ class ManageUserView(
     permission_classes = (IsAuthenticated,)
 
     def get_object(self) -> settings.AUTH_USER_MODEL:
-        return self.request.user
+        # request.user may come from the authentication cache
+        return get_user_model().objects.get(pk=self.request.user.pk)
 
     def get_serializer_class(self) -> UserReadProfileSerializer | UserUpdateSerializer:
         if self.action == "retrieve":
             return UserReadProfileSerializer
+        if self.action == "liked_posts":
+            return UserLikedPostSerializer
         return UserUpdateSerializer
 
+    def perform_update(self, serializer):
+        if "picture" not in serializer.validated_data:
+            user = serializer.save()
+            bump_versions("user", [user.id])
+            return
+
+        # Variants of the replaced picture must not be served meanwhile
+        delete_variants_on_commit(serializer.instance.picture_variants)
+        user = serializer.save(picture_variants={})
+        bump_versions("user", [user.id])
+        generate_user_picture_variants.delay(user.id)
+
+    def perform_destroy(self, instance):
+        user_id = instance.id
+        instance.delete()
+        invalidate_cached_user(user_id)
+        bump_versions("user", [user_id])
+
+    @extend_schema(responses={200: UserLikedPostSerializer(many=True)})
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="liked-posts",
+        url_name="liked-posts",
+    )
+    def liked_posts(self, request) -> Response:
+        """Endpoint for the paginated list of posts liked by the request user"""
+        page = self.paginate_queryset(self.request.user.likes.all())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
 
 class UserPagination(PageNumberPagination):
     page_size = 10
     max_page_size = 100
 
 
+class UserCursorPagination(KeysetPagination):
+    ordering = ("id",)
+    page_number_pagination_class = UserPagination
+
+
 class ReadUserView(
     mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet
 ):
     serializer_class = UserReadSerializer
     permission_classes = (IsAuthenticated,)
-    pagination_class = UserPagination
+    pagination_class = UserCursorPagination
+    use_replica = True
+
+    def get_serializer_class(self) -> UserReadSerializer:
+        if self.action == "followers":
+            return UserFollowersSerializer
+        if self.action == "followings":
+            return UserFollowingsSerializer
+        return UserReadSerializer
 
     def get_queryset(self) -> QuerySet:
-        queryset = get_user_model().objects.prefetch_related("followings", "followers")
+        queryset = get_user_model().objects.all()
 
         if self.action == "list":
+            search = self.request.query_params.get("q")
             first_name = self.request.query_params.get("first_name")
             last_name = self.request.query_params.get("last_name")
             country = self.request.query_params.get("country")
 
+            if search:
+                # Cast to double precision so that cursor values round-trip
+                queryset = (
+                    queryset.filter(
+                        Q(first_name__trigram_word_similar=search)
+                        | Q(last_name__trigram_word_similar=search)
+                    )
+                    .annotate(
+                        similarity=Cast(
+                            Greatest(
+                                TrigramWordSimilarity(search, "first_name"),
+                                TrigramWordSimilarity(search, "last_name"),
+                            ),
+                            FloatField(),
+                        )
+                    )
+                    .order_by("-similarity", "id")
+                )
+
             if first_name:
                 queryset = queryset.filter(first_name__icontains=first_name)
 
@@ -66,12 +163,17 @@ class ReadUserView(
                 queryset = queryset.filter(last_name__icontains=last_name)
 
             if country:
-                queryset = queryset.filter(country__icontains=country)
+                queryset = queryset.filter(country__iexact=country)
 
         return queryset
 
     @extend_schema(
         parameters=[
+            OpenApiParameter(
+                "q",
+                type=str,
+                description="Search users by first or last name, ranked by similarity",
+            ),
             OpenApiParameter(
                 "first_name",
                 type=str,
@@ -85,19 +187,88 @@ class ReadUserView(
             OpenApiParameter(
                 "country",
                 type=str,
-                description="Filter users by country",
+                description="Filter users by country (exact, case insensitive)",
             ),
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    def retrieve(self, request, *args, **kwargs):
+        cache_key = response_cache_key("user-detail", request)
+        data = get_cached_response("user-detail", cache_key)
+
+        if data is not None:
+            return Response(data)
+
+        versions = get_versions([version_key("user", kwargs["pk"])])
+        response = super().retrieve(request, *args, **kwargs)
+        set_cached_response(cache_key, response.data, versions)
+        return response
+
+    @extend_schema(responses={200: UserFollowersSerializer(many=True)})
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="followers",
+        url_name="user-followers",
+    )
+    def followers(self, request, pk=None) -> Response:
+        """Endpoint for the paginated list of user followers"""
+        user = self.get_object()
+        queryset = UserFollower.objects.select_related("follower").filter(user=user)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @extend_schema(responses={200: UserFollowingsSerializer(many=True)})
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="followings",
+        url_name="user-followings",
+    )
+    def followings(self, request, pk=None) -> Response:
+        """Endpoint for the paginated list of users followed by the user"""
+        user = self.get_object()
+        queryset = UserFollower.objects.select_related("user").filter(follower=user)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+def relationship_response(user_id: int, is_following: bool) -> Response:
+    followers_count = (
+        get_user_model()
+        .objects.filter(pk=user_id)
+        .values_list("followers_count", flat=True)
+        .first()
+    )
+    serializer = UserRelationshipSerializer(
+        {
+            "user_id": user_id,
+            "is_following": is_following,
+            "followers_number": followers_count or 0,
+        }
+    )
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+def update_follow_counters(user_id: int, follower_id: int, delta: int) -> None:
+    get_user_model().objects.filter(pk=user_id).update(
+        followers_count=F("followers_count") + delta
+    )
+    get_user_model().objects.filter(pk=follower_id).update(
+        followings_count=F("followings_count") + delta
+    )
+    bump_versions("user", [user_id, follower_id])
+
 
 class UserFollowView(viewsets.GenericViewSet):
     permission_classes = (IsAuthenticated,)
 
     @extend_schema(
-        methods=["POST"], request=None, responses={200: UserReadProfileSerializer}
+        methods=["POST"], request=None, responses={200: UserRelationshipSerializer}
     )
     @action(
         methods=["POST"],
@@ -107,7 +278,7 @@ class UserFollowView(viewsets.GenericViewSet):
         permission_classes=[IsAuthenticated],
     )
     def follow(self, request, pk=None) -> Response:
-        """Endpoint for following user. Returns the profile data of the request user"""
+        """Endpoint for following user. Returns the relationship state"""
         user_id = self.kwargs.get("pk")
         follower_id = self.request.user.id
 
@@ -117,8 +288,9 @@ class UserFollowView(viewsets.GenericViewSet):
 
             serializer.is_valid(raise_exception=True)
             serializer.save()
-            read_serializer = UserReadProfileSerializer(self.request.user)
-            return Response(read_serializer.data, status=status.HTTP_200_OK)
+            update_follow_counters(user_id, follower_id, 1)
+            backfill_timeline.delay(follower_id, user_id)
+            return relationship_response(user_id, is_following=True)
 
         return Response(
             data={"message": "User can't follow self"},
@@ -126,7 +298,7 @@ class UserFollowView(viewsets.GenericViewSet):
         )
 
     @extend_schema(
-        methods=["POST"], request=None, responses={200: UserReadProfileSerializer}
+        methods=["POST"], request=None, responses={200: UserRelationshipSerializer}
     )
     @action(
         methods=["POST"],
@@ -136,9 +308,15 @@ class UserFollowView(viewsets.GenericViewSet):
         permission_classes=[IsAuthenticated],
     )
     def unfollow(self, request, pk=None) -> Response:
-        """Endpoint for unfollowing user. Returns the profile data of the request user"""
+        """Endpoint for unfollowing user. Returns the relationship state"""
         user_id = self.kwargs.get("pk")
         follower_id = self.request.user.id
-        UserFollower.objects.filter(user_id=user_id, follower_id=follower_id).delete()
-        read_serializer = UserReadProfileSerializer(self.request.user)
-        return Response(read_serializer.data, status=status.HTTP_200_OK)
+        deleted, _ = UserFollower.objects.filter(
+            user_id=user_id, follower_id=follower_id
+        ).delete()
+
+        if deleted:
+            update_follow_counters(user_id, follower_id, -1)
+            trim_timeline(follower_id, user_id)
+
+        return relationship_response(user_id, is_following=False)